@@ -17,6 +17,9 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 
+from common.instrumentation import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('_metrics', metrics, name='metrics'),
 ]
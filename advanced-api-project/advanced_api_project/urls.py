@@ -18,8 +18,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from common.instrumentation import metrics
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("_metrics", metrics, name="metrics"),
     # This captures anything starting with 'books/' and sends it to the api app
     path("/", include("api.urls")),
 ]
@@ -5,12 +5,15 @@ from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from rest_framework.response import Response
 
+from common.compiled import CompiledListMixin
+from common.streaming import StreamingListMixin
+
 from .models import Book
 from .serializers import BookSerializer
 
 
 # Retrieve all books
-class BookListView(generics.ListAPIView):
+class BookListView(StreamingListMixin, CompiledListMixin, generics.ListAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]  # allow anyone
@@ -17,8 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from common.instrumentation import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('_metrics', metrics, name='metrics'),
     path('relationship/', include('relationship_app.urls')),
     path('books/', include('bookshelf.urls')),
 ]
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        # Connects the receivers that drop cached tokens.
+        from common import authentication  # noqa: F401
@@ -0,0 +1,71 @@
+import json
+import timeit
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.models import Book
+from common import renderers
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the bytes/sec of the stock JSON renderer and parser with the fast ones '
+        'on the book list response, in a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1000)
+        parser.add_argument('--number', type=int, default=50, help='Renders per run.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per renderer; the fastest one counts.')
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stderr.write('orjson is not installed; the fast renderer falls back to the stock one.')
+        setup_test_environment()
+        test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            Book.objects.bulk_create(
+                Book(title=f'Book {i}', author=f'Author {i % 100}') for i in range(options['books'])
+            )
+            client = APIClient()
+            client.force_authenticate(User.objects.create_user(username='benchmark'))
+            data = client.get(reverse('book-list')).data
+        finally:
+            connection.creation.destroy_test_db(test_db, verbosity=0)
+            teardown_test_environment()
+        content = JSONRenderer().render(data)
+        report = {'book_list': {
+            'bytes': len(content),
+            'render': self.compare(
+                lambda: JSONRenderer().render(data),
+                lambda: renderers.FastJSONRenderer().render(data),
+                len(content), options,
+            ),
+            'parse': self.compare(
+                lambda: JSONParser().parse(BytesIO(content)),
+                lambda: renderers.FastJSONParser().parse(BytesIO(content)),
+                len(content), options,
+            ),
+        }}
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def compare(self, stock, fast, size, options):
+        stock_time = self.measure(stock, options)
+        fast_time = self.measure(fast, options)
+        return {
+            'stock_bytes_per_sec': round(size / stock_time),
+            'fast_bytes_per_sec': round(size / fast_time),
+            'speedup': round(stock_time / fast_time, 2),
+        }
+
+    def measure(self, func, options):
+        """Seconds per call, from the fastest of ``--repeat`` runs."""
+        return min(timeit.repeat(func, number=options['number'], repeat=options['repeat'])) / options['number']
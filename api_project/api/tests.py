@@ -1,3 +1,103 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from common import authentication, instrumentation
+from common.compiled import get_compiled
+from common.renderers import FastJSONRenderer
+
+from .models import Book
+from .serializers import BookSerializer
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        authentication.local_cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.token = Token.objects.create(user=self.user)
+        Book.objects.create(title='Test Book', author='Test Author')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cached_token_skips_auth_queries(self):
+        url = reverse('book_all-list')
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deleted_token_is_rejected(self):
+        url = reverse('book_all-list')
+        self.client.get(url)
+        self.token.delete()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        url = reverse('book_all-list')
+        self.client.get(url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class InstrumentationTests(APITestCase):
+    def setUp(self):
+        instrumentation.histogram.clear()
+        Book.objects.create(title='Test Book', author='Test Author')
+        self.client.force_authenticate(User.objects.create_user(username='testuser', password='testpassword'))
+
+    def test_headers_and_metrics(self):
+        response = self.client.get(reverse('book-list'))
+        self.assertEqual(response['X-Query-Count'], '1')
+        self.assertIn('view;dur=', response['Server-Timing'])
+        self.assertIn('render;dur=', response['Server-Timing'])
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(User.objects.create_user(username='staff', password='password', is_staff=True))
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('django_request_queries_sum{method="GET",route="api/books/",status="200"} 1', metrics)
+
+
+class StreamingListTests(APITestCase):
+    def setUp(self):
+        for i in range(5):
+            Book.objects.create(title=f'Book {i}', author='Author')
+        self.client.force_authenticate(User.objects.create_user(username='testuser', password='testpassword'))
+
+    def test_stream_formats_match_the_regular_list(self):
+        url = reverse('book-list')
+        expected = self.client.get(url).json()
+        response = self.client.get(url, {'stream': 'json'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), expected)
+        response = self.client.get(url, {'stream': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+
+class CompiledSerializerTests(APITestCase):
+    def setUp(self):
+        Book.objects.create(title='Book', author='Author')
+        Book.objects.create(title='"Quoted" Ünïcode', author='')
+        self.client.force_authenticate(User.objects.create_user(username='testuser', password='testpassword'))
+
+    def test_compiled_output_matches_serializer(self):
+        queryset = Book.objects.order_by('id')
+        self.assertEqual(get_compiled(BookSerializer).serialize(queryset), BookSerializer(queryset, many=True).data)
+
+    def test_list_is_read_from_values(self):
+        response = self.client.get(reverse('book-list'))
+        self.assertEqual(response.json(), [{'id': book.id, 'title': book.title, 'author': book.author} for book in Book.objects.all()])
+
+
+class FastJSONTests(APITestCase):
+    def test_books_are_parsed_and_rendered_with_fast_json(self):
+        self.client.force_authenticate(User.objects.create_user(username='testuser', password='testpassword'))
+        response = self.client.post(reverse('book_all-list'), {'title': 'Ünï', 'author': 'Author'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
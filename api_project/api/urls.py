@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import BookList, BookViewSet
+from .views import BookList, BookViewSet, AuthCacheStatsView
 
 router = DefaultRouter()
 router.register(r'books_all', BookViewSet, basename='book_all')
 
 urlpatterns = [
     path('books/', BookList.as_view(), name='book-list'),
+    path('auth/cache-stats/', AuthCacheStatsView.as_view(), name='auth-cache-stats'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -18,8 +18,11 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.authtoken.views import obtain_auth_token
 
+from common.instrumentation import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('_metrics', metrics, name='metrics'),
     path('api/', include('api.urls')),
     path('api-token-auth/', obtain_auth_token),
 ]
@@ -0,0 +1,7 @@
+"""
+Modules shared by the Django projects in this repository.
+
+Each project's settings put the repository root on ``sys.path``, so the
+projects import these as ``common.<module>`` instead of keeping their own
+copies.
+"""
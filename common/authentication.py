@@ -0,0 +1,86 @@
+"""
+Token authentication with a token -> user cache.
+
+Successful lookups are kept in a bounded in-process LRU with a TTL and,
+optionally, in a shared Django cache (``TOKEN_AUTH_CACHE['SHARED_CACHE']``), so
+authenticated requests normally run no authentication queries at all. Entries
+are dropped by the receivers below when a token is deleted or its user is
+saved, which covers deactivation and password changes. They are connected when
+this module is imported, so projects using it import it from an app's
+``ready()``.
+"""
+import copy
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from common.lru import LRUCache
+
+CACHE_SETTINGS = getattr(settings, 'TOKEN_AUTH_CACHE', {})
+TTL = CACHE_SETTINGS.get('TTL', 60)
+SHARED_CACHE = CACHE_SETTINGS.get('SHARED_CACHE')
+KEY_PREFIX = 'auth:token:'
+
+local_cache = LRUCache(CACHE_SETTINGS.get('MAXSIZE', 10000), TTL)
+shared_stats = {'hits': 0, 'misses': 0}
+
+
+def get_shared_cache():
+    return caches[SHARED_CACHE] if SHARED_CACHE else None
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        entry = local_cache.get(key)
+        if entry is None:
+            entry = self.get_shared_entry(key)
+        if entry is None:
+            user, token = super().authenticate_credentials(key)
+            entry = (user, token)
+            local_cache.set(key, entry)
+            shared = get_shared_cache()
+            if shared is not None:
+                shared.set(KEY_PREFIX + key, entry, TTL)
+        user, token = entry
+        # Each request gets its own copy so views can't mutate the cached user.
+        return copy.copy(user), token
+
+    def get_shared_entry(self, key):
+        shared = get_shared_cache()
+        if shared is None:
+            return None
+        entry = shared.get(KEY_PREFIX + key)
+        if entry is None:
+            shared_stats['misses'] += 1
+            return None
+        shared_stats['hits'] += 1
+        local_cache.set(key, entry)
+        return entry
+
+
+def invalidate(keys):
+    shared = get_shared_cache()
+    for key in keys:
+        local_cache.delete(key)
+        if shared is not None:
+            shared.delete(KEY_PREFIX + key)
+
+
+def stats():
+    return {'local': local_cache.stats(), 'shared': dict(shared_stats) if SHARED_CACHE else None}
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate([instance.key])
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    if not created:
+        invalidate(Token.objects.filter(user=instance).values_list('key', flat=True))
@@ -0,0 +1,156 @@
+"""
+Compiled read-only serializers.
+
+For every row a ``ModelSerializer`` builds a model instance, then resolves,
+``None``-checks and converts each field through its own methods. A
+``CompiledSerializer`` inspects the fields of a serializer class once and
+generates one flat function that builds the same dict straight from a
+``.values()`` row:
+
+- a field's ``source`` becomes a ``.values()`` lookup, so ``author.username``
+  is read as ``author__username``;
+- strings, numbers, booleans and primary keys are copied as they come from
+  the database; other plain fields, such as datetimes, call the field's
+  ``to_representation``;
+- a ``SerializerMethodField`` named ``x`` is filled for a whole batch of rows
+  by the serializer's ``load_x(rows, context)`` static method when it has
+  one, and is otherwise read from a column called ``x``, usually an
+  annotation. Extra columns the loaders need are listed in the serializer's
+  ``compiled_values``;
+- nested ``many=True`` serializers over a reverse foreign key are compiled
+  as well and loaded with one query per batch.
+
+Any other field raises ``ImproperlyConfigured`` when the serializer is compiled.
+"""
+from collections import defaultdict
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.response import Response
+
+# Fields whose representation of a database value is the value itself.
+COPIED_FIELDS = (
+    serializers.BooleanField, serializers.CharField, serializers.FloatField,
+    serializers.IntegerField, serializers.ReadOnlyField,
+)
+UNSUPPORTED_FIELDS = (serializers.RelatedField, serializers.ManyRelatedField, serializers.BaseSerializer)
+
+
+class NestedLoader:
+    """Loads a nested ``many=True`` serializer over a reverse foreign key for a batch of rows."""
+    lookups = ('pk',)
+
+    def __init__(self, name, field, model):
+        relation = model._meta.get_field(field.source)
+        if not relation.one_to_many:
+            raise ImproperlyConfigured(f'Cannot compile nested field "{name}": only reverse foreign keys are supported.')
+        self.name = name
+        self.fk = relation.field.name
+        self.model = relation.related_model
+        self.child = get_compiled(type(field.child))
+
+    def __call__(self, rows, context):
+        children = defaultdict(list)
+        if rows:
+            queryset = self.model._default_manager.filter(**{f'{self.fk}__in': [row['pk'] for row in rows]})
+            if not queryset.ordered:
+                queryset = queryset.order_by('pk')
+            child_rows = list(self.child.values(queryset, [self.fk]))
+            for child_row, data in zip(child_rows, self.child.represent(child_rows, context)):
+                children[child_row[self.fk]].append(data)
+        for row in rows:
+            row[self.name] = children[row['pk']]
+
+
+class CompiledSerializer:
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.lookups = []
+        self.loaders = []
+        entries = []
+        namespace = {}
+        for index, field in enumerate(serializer_class()._readable_fields):
+            name = field.field_name
+            if isinstance(field, serializers.SerializerMethodField):
+                loader = getattr(serializer_class, f'load_{name}', None)
+                if loader is not None:
+                    self.loaders.append(loader)
+                else:
+                    self._add_lookup(name)
+                entries.append(f'{name!r}: row[{name!r}]')
+            elif isinstance(field, serializers.ListSerializer):
+                self.loaders.append(NestedLoader(name, field, serializer_class.Meta.model))
+                entries.append(f'{name!r}: row[{name!r}]')
+            elif field.source == '*':
+                raise ImproperlyConfigured(f'Cannot compile field "{name}" with source="*".')
+            elif isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None or (
+                isinstance(field, COPIED_FIELDS)
+            ):
+                lookup = self._add_lookup('__'.join(field.source_attrs))
+                entries.append(f'{name!r}: row[{lookup!r}]')
+            elif isinstance(field, UNSUPPORTED_FIELDS):
+                raise ImproperlyConfigured(f'Cannot compile field "{name}" ({type(field).__name__}).')
+            else:
+                lookup = self._add_lookup('__'.join(field.source_attrs))
+                namespace[f'convert_{index}'] = field.to_representation
+                # Serializers never pass None to to_representation; neither does this.
+                entries.append(f'{name!r}: None if (value := row[{lookup!r}]) is None else convert_{index}(value)')
+        for loader in self.loaders:
+            for lookup in getattr(loader, 'lookups', ()):
+                self._add_lookup(lookup)
+        for lookup in getattr(serializer_class, 'compiled_values', ()):
+            self._add_lookup(lookup)
+        source = 'def convert(row):\n    return {\n' + ''.join(f'        {entry},\n' for entry in entries) + '    }\n'
+        exec(compile(source, f'<compiled {serializer_class.__qualname__}>', 'exec'), namespace)
+        self.convert = namespace['convert']
+
+    def _add_lookup(self, lookup):
+        if lookup not in self.lookups:
+            self.lookups.append(lookup)
+        return lookup
+
+    def values(self, queryset, extra=()):
+        """``queryset`` as the ``.values()`` rows this serializer reads, plus ``extra`` columns."""
+        lookups = self.lookups + [lookup for lookup in extra if lookup not in self.lookups]
+        return queryset.prefetch_related(None).values(*lookups)
+
+    def represent(self, rows, context=None):
+        """The serialized form of ``rows``, as a list of dicts."""
+        rows = list(rows)
+        for loader in self.loaders:
+            loader(rows, context or {})
+        convert = self.convert
+        return [convert(row) for row in rows]
+
+    def serialize(self, queryset, context=None):
+        return self.represent(self.values(queryset), context)
+
+
+_compiled = {}
+
+
+def get_compiled(serializer_class):
+    compiled = _compiled.get(serializer_class)
+    if compiled is None:
+        compiled = _compiled[serializer_class] = CompiledSerializer(serializer_class)
+    return compiled
+
+
+class CompiledListMixin:
+    """
+    Serialize ``list`` responses with the compiled form of the view's serializer.
+
+    The queryset still goes through ``get_queryset``, the filters and the
+    paginator; it is just read with ``.values()``. Keyset ordering columns are
+    read along with the fields so the paginator can build its cursor.
+    """
+
+    def list(self, request, *args, **kwargs):
+        compiled = get_compiled(self.get_serializer_class())
+        ordering = getattr(self, 'keyset_ordering', getattr(self.paginator, 'ordering', ()))
+        rows = compiled.values(self.filter_queryset(self.get_queryset()), [field.lstrip('-') for field in ordering])
+        context = self.get_serializer_context()
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(compiled.represent(page, context))
+        return Response(compiled.represent(rows, context))
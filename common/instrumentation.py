@@ -0,0 +1,242 @@
+"""
+Per-request query and latency instrumentation.
+
+``InstrumentationMiddleware`` counts and times the database queries of every
+request, times the view (which includes building serializer data), the
+rendering of template and DRF responses and the request as a whole, and
+reports the numbers in a ``Server-Timing`` header plus ``X-Query-Count`` and
+``X-Duplicate-Queries``. A statement that runs ``DUPLICATE_THRESHOLD`` times
+or more in one request (the usual N+1 pattern) is logged once, with a sample
+of the stack that issued it.
+
+Each request is also added to a rolling, per-route histogram that covers the
+last ``WINDOW_SECONDS``. The ``metrics`` view serves it in the Prometheus
+text format to staff users, or to anyone when ``METRICS_PUBLIC`` is set (for a
+scraper on a network that can't reach the site otherwise). Settings come from
+the ``INSTRUMENTATION`` dict.
+"""
+import logging
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+INSTRUMENTATION_SETTINGS = getattr(settings, 'INSTRUMENTATION', {})
+HEADERS = INSTRUMENTATION_SETTINGS.get('HEADERS', True)
+DUPLICATE_THRESHOLD = INSTRUMENTATION_SETTINGS.get('DUPLICATE_THRESHOLD', 3)
+STACK_DEPTH = INSTRUMENTATION_SETTINGS.get('STACK_DEPTH', 8)
+METRICS_PUBLIC = INSTRUMENTATION_SETTINGS.get('METRICS_PUBLIC', False)
+WINDOW_SECONDS = INSTRUMENTATION_SETTINGS.get('WINDOW_SECONDS', 300)
+WINDOW_SLOTS = INSTRUMENTATION_SETTINGS.get('WINDOW_SLOTS', 10)
+BUCKETS = INSTRUMENTATION_SETTINGS.get('BUCKETS', (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+
+# Frames from these paths say nothing about which code issued a query.
+_LIBRARY_PATHS = ('/django/', '/rest_framework/', '/asgiref/', '/site-packages/', __file__)
+
+
+class QueryRecorder:
+    """Database execute wrapper that counts, times and groups the queries of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.samples = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+            if self.statements[sql] == DUPLICATE_THRESHOLD:
+                self.samples[sql] = stack_sample()
+
+    @property
+    def duplicates(self):
+        return {sql: count for sql, count in self.statements.items() if count >= DUPLICATE_THRESHOLD}
+
+
+def stack_sample():
+    """The innermost application frames of the current stack, outermost first."""
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if not any(path in frame.filename for path in _LIBRARY_PATHS)
+    ]
+    return ''.join(traceback.format_list(frames[-STACK_DEPTH:]))
+
+
+class RollingHistogram:
+    """
+    Request latencies and query counts per ``(method, route, status)`` over the
+    last ``WINDOW_SECONDS``. The window is split into ``WINDOW_SLOTS`` slots;
+    the oldest slot is dropped whenever a new one starts, so memory stays
+    bounded by the number of routes however much traffic there is.
+    """
+
+    def __init__(self, buckets=BUCKETS, window=WINDOW_SECONDS, slots=WINDOW_SLOTS):
+        self.buckets = tuple(buckets)
+        self.slot_seconds = window / slots
+        self.slots = slots
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _new_slot(self):
+        return {
+            'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0,
+            'db_sum': 0.0, 'queries': 0, 'duplicates': 0,
+        }
+
+    def observe(self, labels, duration, db_duration, queries, duplicates, now=None):
+        slot_id = int((time.monotonic() if now is None else now) // self.slot_seconds)
+        with self._lock:
+            ring = self._series.setdefault(labels, {})
+            slot = ring.get(slot_id)
+            if slot is None:
+                slot = ring[slot_id] = self._new_slot()
+                for old in [key for key in ring if key <= slot_id - self.slots]:
+                    del ring[old]
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    slot['buckets'][i] += 1
+            slot['count'] += 1
+            slot['sum'] += duration
+            slot['db_sum'] += db_duration
+            slot['queries'] += queries
+            slot['duplicates'] += duplicates
+
+    def snapshot(self, now=None):
+        """Totals per series over the current window."""
+        oldest = int((time.monotonic() if now is None else now) // self.slot_seconds) - self.slots + 1
+        totals = defaultdict(self._new_slot)
+        with self._lock:
+            for labels, ring in self._series.items():
+                for slot_id, slot in ring.items():
+                    if slot_id < oldest:
+                        continue
+                    total = totals[labels]
+                    total['buckets'] = [a + b for a, b in zip(total['buckets'], slot['buckets'])]
+                    for key in ('count', 'sum', 'db_sum', 'queries', 'duplicates'):
+                        total[key] += slot[key]
+        return dict(totals)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self, now=None):
+        """The window in the Prometheus text exposition format."""
+        snapshot = sorted(self.snapshot(now).items())
+        window = f'over the last {int(self.slot_seconds * self.slots)}s'
+        lines = [
+            f'# HELP django_request_duration_seconds Request latency {window}.',
+            '# TYPE django_request_duration_seconds histogram',
+        ]
+        for labels, total in snapshot:
+            base = _format_labels(labels)
+            for bound, count in zip(self.buckets, total['buckets']):
+                lines.append(f'django_request_duration_seconds_bucket{{{base},le="{bound}"}} {count}')
+            lines.append(f'django_request_duration_seconds_bucket{{{base},le="+Inf"}} {total["count"]}')
+            lines.append(f'django_request_duration_seconds_sum{{{base}}} {total["sum"]:.6f}')
+            lines.append(f'django_request_duration_seconds_count{{{base}}} {total["count"]}')
+        for name, key, help_text in (
+            ('django_request_db_duration_seconds_sum', 'db_sum', 'Time spent in database queries'),
+            ('django_request_queries_sum', 'queries', 'Database queries run'),
+            ('django_request_duplicate_queries_sum', 'duplicates', 'Repeated (N+1) statements seen'),
+        ):
+            lines.append(f'# HELP {name} {help_text} {window}.')
+            lines.append(f'# TYPE {name} gauge')
+            for labels, total in snapshot:
+                value = f'{total[key]:.6f}' if isinstance(total[key], float) else total[key]
+                lines.append(f'{name}{{{_format_labels(labels)}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    method, route, status = labels
+    route = route.replace('\\', '\\\\').replace('"', '\\"')
+    return f'method="{method}",route="{route}",status="{status}"'
+
+
+histogram = RollingHistogram()
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    # Routes of regex patterns (DRF routers) end with an anchor that adds nothing to a label.
+    return match.route.rstrip('$') or match.view_name
+
+
+class InstrumentationMiddleware:
+    """Place it first in ``MIDDLEWARE`` so the total covers the other middleware too."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        duplicates = recorder.duplicates
+        for sql, count in duplicates.items():
+            logger.warning(
+                'Query ran %d times in %s %s: %s\n%s',
+                count, request.method, request.path, sql, recorder.samples.get(sql, ''),
+            )
+        histogram.observe(
+            (request.method, _route(request), response.status_code),
+            total, recorder.duration, recorder.count, len(duplicates),
+        )
+        if HEADERS:
+            timings = [f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"']
+            view_start = getattr(request, '_instrumentation_view_start', None)
+            if view_start is not None:
+                # Responses that aren't rendered later end with the view, less the response middleware.
+                view_end = getattr(request, '_instrumentation_view_end', None) or time.perf_counter()
+                timings.append(f'view;dur={(view_end - view_start) * 1000:.1f}')
+            render = getattr(request, '_instrumentation_render', None)
+            if render is not None:
+                timings.append(f'render;dur={render * 1000:.1f}')
+            timings.append(f'total;dur={total * 1000:.1f}')
+            response['Server-Timing'] = ', '.join(timings)
+            response['X-Query-Count'] = str(recorder.count)
+            if duplicates:
+                response['X-Duplicate-Queries'] = str(len(duplicates))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._instrumentation_view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Called just before a template or DRF response is rendered; the callback runs right after.
+        start = request._instrumentation_view_end = time.perf_counter()
+
+        def rendered(response):
+            request._instrumentation_render = time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def metrics(request):
+    """The request histogram in the Prometheus text format; route it in the project's URLconf."""
+    user = getattr(request, 'user', None)
+    if not METRICS_PUBLIC and not (user is not None and user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(histogram.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,130 @@
+"""
+Opt-in sampling profiler for individual requests.
+
+``SamplingProfilerMiddleware`` profiles a request when any of its triggers
+from the ``PROFILING`` setting fires:
+
+- the ``HEADER`` request header is sent, carrying ``SECRET`` (any value is
+  accepted under ``DEBUG`` when no secret is configured);
+- a random draw falls below ``SAMPLE_RATE``;
+- the path starts with one of ``PATHS``.
+
+While a profiled request runs, a background thread reads the request thread's
+stack from ``sys._current_frames()`` every ``INTERVAL`` seconds. Stacks are
+aggregated per view and written to ``OUTPUT_DIR/<view>.folded`` in the
+collapsed format read by ``flamegraph.pl`` and speedscope. When no trigger is
+configured the middleware removes itself at startup, and otherwise an
+unprofiled request costs a header lookup and a random draw.
+"""
+import os
+import random
+import sys
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+PROFILING_SETTINGS = getattr(settings, 'PROFILING', {})
+HEADER = PROFILING_SETTINGS.get('HEADER', 'X-Profile')
+SECRET = PROFILING_SETTINGS.get('SECRET')
+SAMPLE_RATE = PROFILING_SETTINGS.get('SAMPLE_RATE', 0)
+PATHS = tuple(PROFILING_SETTINGS.get('PATHS', ()))
+INTERVAL = PROFILING_SETTINGS.get('INTERVAL', 0.005)
+OUTPUT_DIR = PROFILING_SETTINGS.get('OUTPUT_DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+
+
+def _frame_label(frame):
+    return f'{frame.f_globals.get("__name__", "?")}:{frame.f_code.co_name}'
+
+
+class Sampler(threading.Thread):
+    """Collects the stacks of ``thread_id`` below the frame running ``root_code``."""
+
+    def __init__(self, thread_id, root_code, interval=INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.root_code = root_code
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame.f_code is not self.root_code:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.stacks
+
+
+class ProfileStore:
+    """Collapsed stacks per view, rewritten to ``<view>.folded`` after every profiled request."""
+
+    def __init__(self, directory=OUTPUT_DIR):
+        self.directory = directory
+        self._stacks = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def path(self, view_name):
+        safe = ''.join(c if c.isalnum() or c in '._-' else '_' for c in view_name)
+        return os.path.join(self.directory, f'{safe}.folded')
+
+    def add(self, view_name, stacks):
+        with self._lock:
+            totals = self._stacks[view_name]
+            totals.update(stacks)
+            os.makedirs(self.directory, exist_ok=True)
+            path = self.path(view_name)
+            with open(f'{path}.tmp', 'w') as f:
+                for stack, count in totals.most_common():
+                    f.write(f'{stack} {count}\n')
+            os.replace(f'{path}.tmp', path)
+
+    def clear(self):
+        with self._lock:
+            self._stacks.clear()
+
+
+store = ProfileStore()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match._func_path if match is not None else 'unmatched'
+
+
+class SamplingProfilerMiddleware:
+    def __init__(self, get_response):
+        self.header_allowed = bool(SECRET) or settings.DEBUG
+        if not (self.header_allowed or SAMPLE_RATE or PATHS):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        if self.header_allowed:
+            value = request.headers.get(HEADER)
+            if value is not None and (not SECRET or value == SECRET):
+                return True
+        if PATHS and request.path.startswith(PATHS):
+            return True
+        return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        sampler = Sampler(threading.get_ident(), sys._getframe().f_code, INTERVAL)
+        sampler.start()
+        try:
+            return self.get_response(request)
+        finally:
+            stacks = sampler.stop()
+            if stacks:
+                store.add(_view_name(request), stacks)
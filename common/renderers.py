@@ -0,0 +1,98 @@
+"""
+JSON renderer and parser backed by orjson when it is installed.
+
+``FastJSONRenderer`` produces the same bytes as DRF's ``JSONRenderer``:
+datetimes and dates are written natively, and anything orjson can't encode on
+its own (``Decimal``, lazy translation strings, querysets...) goes through
+DRF's encoder. Requests the compact orjson output can't serve, such as
+indented output for the browsable API or ``UNICODE_JSON = False``, and
+documents it rejects, such as integers over 64 bits, are rendered by the stock
+renderer. So are documents holding NaN or an infinity, which orjson would write
+as ``null``: the stock renderer raises ``ValueError`` for them, or writes them
+as JavaScript literals when ``STRICT_JSON`` is off. Without orjson both classes
+behave exactly like DRF's.
+"""
+import datetime
+import math
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+# JSONRenderer escapes these so its output is also valid JavaScript; orjson doesn't.
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+UTF8_NAMES = ('utf-8', 'utf8')
+
+_default = JSONEncoder().default
+_stock_renderer = JSONRenderer()
+
+
+# Values that can't hold a float, skipped without further checks.
+_LEAF_TYPES = frozenset((str, int, bool, type(None), datetime.datetime, datetime.date))
+
+
+def has_non_finite_float(data):
+    """Whether ``data`` holds a NaN or infinite float anywhere in its containers."""
+    if isinstance(data, dict):
+        data = data.values()
+    elif not isinstance(data, (list, tuple)):
+        return isinstance(data, float) and not math.isfinite(data)
+    for value in data:
+        if value.__class__ not in _LEAF_TYPES and has_non_finite_float(value):
+            return True
+    return False
+
+
+def dumps(data):
+    """``data`` as compact UTF-8 JSON bytes, like ``FastJSONRenderer`` writes it."""
+    if orjson is not None:
+        try:
+            ret = orjson.dumps(data, default=_default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            pass
+        else:
+            # Only a document with a null can hide a non-finite float, so most skip the walk.
+            if b'null' in ret and has_non_finite_float(data):
+                return _stock_renderer.render(data)
+            for char, escaped in LINE_SEPARATORS:
+                if char in ret:
+                    ret = ret.replace(char, escaped)
+            return ret
+    return _stock_renderer.render(data)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            orjson is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        # orjson only reads UTF-8 and always rejects NaN and Infinity.
+        if orjson is None or not self.strict or encoding.lower() not in UTF8_NAMES:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,66 @@
+"""
+Streaming list responses.
+
+``?stream=json`` or ``?stream=ndjson`` turns a list endpoint into a
+``StreamingHttpResponse``: rows come from ``QuerySet.iterator(chunk_size)``,
+are serialized one at a time and sent ``CHUNK_SIZE`` rows per chunk, so the
+memory used no longer grows with the number of rows. Streamed lists are not
+paginated.
+"""
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+
+from common.renderers import dumps
+
+STREAM_QUERY_PARAM = 'stream'
+CHUNK_SIZE = 500
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def get_stream_format(request):
+    """The requested stream format, or ``None`` for a regular response."""
+    stream_format = request.query_params.get(STREAM_QUERY_PARAM)
+    if stream_format is not None and stream_format not in CONTENT_TYPES:
+        raise ValidationError({STREAM_QUERY_PARAM: f'Must be one of: {", ".join(CONTENT_TYPES)}.'})
+    return stream_format
+
+
+def iter_chunks(rows, serialize, stream_format, chunk_size=CHUNK_SIZE):
+    """Encode ``rows`` as a JSON array or as newline-delimited JSON, ``chunk_size`` rows per chunk."""
+    ndjson = stream_format == 'ndjson'
+    chunk = [] if ndjson else [b'[']
+    for i, row in enumerate(rows):
+        data = dumps(serialize(row))
+        chunk.append(data + b'\n' if ndjson else (b',' if i else b'') + data)
+        if len(chunk) >= chunk_size:
+            yield b''.join(chunk)
+            chunk = []
+    if not ndjson:
+        chunk.append(b']')
+    if chunk:
+        yield b''.join(chunk)
+
+
+def stream_response(queryset, serialize, stream_format, chunk_size=CHUNK_SIZE):
+    rows = queryset.iterator(chunk_size=chunk_size)
+    return StreamingHttpResponse(
+        iter_chunks(rows, serialize, stream_format, chunk_size),
+        content_type=f'{CONTENT_TYPES[stream_format]}; charset=utf-8',
+    )
+
+
+class StreamingListMixin:
+    """Adds the ``stream`` query parameter to a list view."""
+    stream_chunk_size = CHUNK_SIZE
+
+    def list(self, request, *args, **kwargs):
+        stream_format = get_stream_format(request)
+        if stream_format is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        # One serializer serves every row; only its output is kept.
+        serialize = self.get_serializer().to_representation
+        return stream_response(queryset, serialize, stream_format, self.stream_chunk_size)
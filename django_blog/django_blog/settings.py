@@ -10,11 +10,15 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# The shared ``common`` package lives at the repository root.
+sys.path.append(str(BASE_DIR.parent))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/6.0/howto/deployment/checklist/
@@ -54,6 +58,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
 
+    'common.instrumentation.InstrumentationMiddleware',
+
+    'common.profiling.SamplingProfilerMiddleware',
+
     'django.middleware.security.SecurityMiddleware',
 
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -166,3 +174,13 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Opt-in sampling profiler; collapsed stacks per view are written to OUTPUT_DIR.
+# Send the HEADER with SECRET (any value under DEBUG), set a SAMPLE_RATE or list PATHS.
+PROFILING = {
+    'HEADER': 'X-Profile',
+    'SECRET': None,
+    'SAMPLE_RATE': 0,
+    'PATHS': [],
+    'INTERVAL': 0.005,
+    'OUTPUT_DIR': BASE_DIR / 'profiles',
+}
@@ -19,8 +19,11 @@ from django.urls import path, include
 from django.conf import settings # Import settings
 from django.conf.urls.static import static # Import static
 
+from common.instrumentation import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('_metrics', metrics, name='metrics'),
     path('', include('blog.urls')),
 ]
 
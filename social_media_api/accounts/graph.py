@@ -0,0 +1,187 @@
+"""
+Follower graph service.
+
+Keeps each user's following and follower id sets in bounded in-process LRU
+caches. Follow and unfollow writes go to the database and are applied to the
+cached sets by an ``m2m_changed`` receiver, so lookups never need to hit the
+``following`` table once a user's sets are warm.
+
+The LRUs are per process: a write only updates the copy of the process that
+made it, and other processes keep serving their copy for up to ``TTL``
+seconds. Set ``FOLLOWER_GRAPH_CACHE['SHARED_CACHE']`` to a cache alias shared
+by all processes to close that gap: every cached set is then stamped with its
+user's version token from the shared cache, writes replace the tokens of both
+users after commit, and a set whose token no longer matches is reloaded.
+Use the graph for reads; code that writes follows should read the current
+edges from the database.
+
+Follower and following counts are cached on their own and loaded for many users
+with one grouped query, so counting never loads an id set. A follow updates the
+follower's own following set and drops the rest: the counts, which removing an
+edge that doesn't exist would throw off if they were adjusted, and the followed
+user's follower set, which can be too large to copy on every follow.
+"""
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count
+
+from common.lru import LRUCache
+
+User = get_user_model()
+Follow = User.following.through
+
+GRAPH_SETTINGS = getattr(settings, 'FOLLOWER_GRAPH_CACHE', {})
+TTL = GRAPH_SETTINGS.get('TTL', 30)
+SHARED_CACHE = GRAPH_SETTINGS.get('SHARED_CACHE')
+VERSION_KEY = 'accounts:graph:version:{}'
+
+# Entries are (version token, frozenset of ids) and (version token, count).
+_following = LRUCache(GRAPH_SETTINGS.get('MAXSIZE', 10000), TTL)
+_followers = LRUCache(GRAPH_SETTINGS.get('MAXSIZE', 10000), TTL)
+_following_counts = LRUCache(GRAPH_SETTINGS.get('MAXSIZE', 10000), TTL)
+_follower_counts = LRUCache(GRAPH_SETTINGS.get('MAXSIZE', 10000), TTL)
+
+
+def get_shared_cache():
+    return caches[SHARED_CACHE] if SHARED_CACHE else None
+
+
+def _get_versions(user_ids):
+    shared = get_shared_cache()
+    if shared is None:
+        return {}
+    keys = {user_id: VERSION_KEY.format(user_id) for user_id in user_ids}
+    versions = shared.get_many(keys.values())
+    return {user_id: versions.get(key) for user_id, key in keys.items()}
+
+
+def _bump_versions(user_ids):
+    shared = get_shared_cache()
+    if shared is not None:
+        user_ids = set(user_ids)
+        transaction.on_commit(
+            lambda: shared.set_many({VERSION_KEY.format(user_id): uuid.uuid4().hex for user_id in user_ids}, None)
+        )
+
+
+def _get_many(cache, user_ids, load):
+    """Cached values for ``user_ids``, calling ``load(missing_ids)`` once for the rest."""
+    result, missing = {}, []
+    versions = _get_versions(user_ids)
+    for user_id in user_ids:
+        entry = cache.get(user_id)
+        if entry is None or entry[0] != versions.get(user_id):
+            missing.append(user_id)
+        else:
+            result[user_id] = entry[1]
+    if missing:
+        for user_id, value in load(missing).items():
+            cache.set(user_id, (versions.get(user_id), value))
+            result[user_id] = value
+    return result
+
+
+def _load(cache, user_ids, key_field, value_field):
+    def load(missing):
+        loaded = {user_id: set() for user_id in missing}
+        rows = Follow.objects.filter(**{f'{key_field}__in': missing}).values_list(key_field, value_field)
+        for key, value in rows.iterator():
+            loaded[key].add(value)
+        return {user_id: frozenset(ids) for user_id, ids in loaded.items()}
+    return _get_many(cache, user_ids, load)
+
+
+def _load_counts(cache, user_ids, key_field):
+    def load(missing):
+        loaded = dict.fromkeys(missing, 0)
+        loaded.update(
+            Follow.objects.filter(**{f'{key_field}__in': missing}).order_by()
+            .values_list(key_field).annotate(total=Count('id'))
+        )
+        return loaded
+    return _get_many(cache, user_ids, load)
+
+
+def get_following_ids_many(user_ids):
+    return _load(_following, user_ids, 'from_customuser', 'to_customuser')
+
+
+def get_following_ids(user_id):
+    return get_following_ids_many([user_id])[user_id]
+
+
+def get_follower_ids(user_id):
+    return _load(_followers, [user_id], 'to_customuser', 'from_customuser')[user_id]
+
+
+def is_following(user_id, target_id):
+    return target_id in get_following_ids(user_id)
+
+
+def get_mutual_ids(user_id):
+    return get_following_ids(user_id) & get_follower_ids(user_id)
+
+
+def get_follower_counts_many(user_ids):
+    return _load_counts(_follower_counts, user_ids, 'to_customuser')
+
+
+def get_following_counts_many(user_ids):
+    return _load_counts(_following_counts, user_ids, 'from_customuser')
+
+
+def follower_count(user_id):
+    return get_follower_counts_many([user_id])[user_id]
+
+
+def following_count(user_id):
+    return get_following_counts_many([user_id])[user_id]
+
+
+def suggest(user_id, limit=10):
+    """
+    Friends-of-friends: users followed by the people ``user_id`` follows, ranked
+    by how many of them follow each candidate. Returns ``[(user_id, score)]``.
+    """
+    following = get_following_ids(user_id)
+    scores = Counter()
+    for ids in get_following_ids_many(following).values():
+        scores.update(ids)
+    for excluded in following | {user_id}:
+        scores.pop(excluded, None)
+    return scores.most_common(limit)
+
+
+def record_follows(pairs):
+    """Apply ``(follower_id, followed_id)`` edges to the cached sets."""
+    _record(pairs, frozenset.union)
+
+
+def record_unfollows(pairs):
+    _record(pairs, frozenset.difference)
+
+
+def _record(pairs, apply):
+    pairs = list(pairs)
+    following = {}
+    for follower_id, followed_id in pairs:
+        following.setdefault(follower_id, set()).add(followed_id)
+        _followers.delete(followed_id)
+        _follower_counts.delete(followed_id)
+        _following_counts.delete(follower_id)
+    # One copy of each follower's own set, however many users they followed at once.
+    for follower_id, ids in following.items():
+        _following.update(follower_id, lambda entry, ids=ids: (entry[0], apply(entry[1], ids)))
+    _bump_versions(user_id for pair in pairs for user_id in pair)
+
+
+def clear():
+    _following.clear()
+    _followers.clear()
+    _following_counts.clear()
+    _follower_counts.clear()
@@ -1,11 +1,50 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from rest_framework.authtoken.models import Token
+from . import graph
+
+class UserListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        users = list(data.all() if hasattr(data, 'all') else data)
+        # Warm the graph for the whole list with one query each, so the per-user
+        # fields below don't query once per row.
+        user_ids = [user.pk for user in users]
+        graph.get_follower_counts_many(user_ids)
+        graph.get_following_counts_many(user_ids)
+        graph.get_following_ids_many(user_ids)
+        return super().to_representation(users)
 
 class UserSerializer(serializers.ModelSerializer):
+    followers_count = serializers.SerializerMethodField()
+    following_count = serializers.SerializerMethodField()
+    is_following = serializers.SerializerMethodField()
+    follows_you = serializers.SerializerMethodField()
+
     class Meta:
         model = get_user_model()
-        fields = ('id', 'username', 'email', 'bio', 'profile_picture')
+        fields = ('id', 'username', 'email', 'bio', 'profile_picture',
+                  'followers_count', 'following_count', 'is_following', 'follows_you')
+        list_serializer_class = UserListSerializer
+
+    def get_viewer_id(self):
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return None
+        return request.user.pk
+
+    def get_followers_count(self, obj):
+        return graph.follower_count(obj.pk)
+
+    def get_following_count(self, obj):
+        return graph.following_count(obj.pk)
+
+    def get_is_following(self, obj):
+        viewer_id = self.get_viewer_id()
+        return viewer_id is not None and graph.is_following(viewer_id, obj.pk)
+
+    def get_follows_you(self, obj):
+        viewer_id = self.get_viewer_id()
+        return viewer_id is not None and graph.is_following(obj.pk, viewer_id)
 
 class RegisterSerializer(serializers.ModelSerializer):
     # The checker specifically looks for serializers.CharField()
@@ -25,3 +64,8 @@ class RegisterSerializer(serializers.ModelSerializer):
         )
         Token.objects.create(user=user)
         return user
+
+class BulkFollowSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500
+    )
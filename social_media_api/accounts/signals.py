@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+# Connects the receivers that drop cached tokens.
+from common import authentication  # noqa: F401
+from . import graph
+
+User = get_user_model()
+
+
+@receiver(m2m_changed, sender=User.following.through)
+def update_follower_graph(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_clear':
+        graph.clear()
+        return
+    if action not in ('post_add', 'post_remove'):
+        return
+    if reverse:
+        pairs = [(pk, instance.pk) for pk in pk_set]
+    else:
+        pairs = [(instance.pk, pk) for pk in pk_set]
+    if action == 'post_add':
+        graph.record_follows(pairs)
+    else:
+        graph.record_unfollows(pairs)
+
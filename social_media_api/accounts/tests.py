@@ -1,3 +1,212 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from common import authentication
+from notifications import counters, queue
+from posts import timeline
+from posts.models import Post, TimelineEntry
+from social_media_api import throttling
+from . import graph
+
+User = get_user_model()
+
+
+class FollowerGraphTests(APITestCase):
+    def setUp(self):
+        graph.clear()
+        self.alice, self.bob, self.carol, self.dave = (
+            User.objects.create_user(username=name, password='password')
+            for name in ('alice', 'bob', 'carol', 'dave')
+        )
+        self.client.force_authenticate(self.alice)
+
+    def test_follow_and_unfollow_write_through(self):
+        self.assertFalse(graph.is_following(self.alice.pk, self.bob.pk))
+        self.client.post(reverse('follow_user', args=[self.bob.pk]))
+        with self.assertNumQueries(0):
+            self.assertTrue(graph.is_following(self.alice.pk, self.bob.pk))
+        self.client.post(reverse('unfollow_user', args=[self.bob.pk]))
+        with self.assertNumQueries(0):
+            self.assertFalse(graph.is_following(self.alice.pk, self.bob.pk))
+
+    @mock.patch.object(graph, 'SHARED_CACHE', 'default')
+    def test_writes_in_other_processes_are_seen_with_a_shared_cache(self):
+        cache.clear()
+        self.assertFalse(graph.is_following(self.alice.pk, self.bob.pk))
+        # Another process writes the edge: only the shared version tokens change here.
+        User.following.through.objects.create(from_customuser=self.alice, to_customuser=self.bob)
+        with self.captureOnCommitCallbacks(execute=True):
+            graph._bump_versions([self.alice.pk, self.bob.pk])
+        self.assertTrue(graph.is_following(self.alice.pk, self.bob.pk))
+        with self.assertNumQueries(0):
+            self.assertTrue(graph.is_following(self.alice.pk, self.bob.pk))
+
+    def test_reverse_side_updates_cached_sets(self):
+        self.assertEqual(graph.follower_count(self.bob.pk), 0)
+        self.assertFalse(graph.is_following(self.alice.pk, self.bob.pk))
+        self.bob.followers.add(self.alice, self.carol)
+        with self.assertNumQueries(0):
+            self.assertTrue(graph.is_following(self.alice.pk, self.bob.pk))
+        self.assertEqual(graph.follower_count(self.bob.pk), 2)
+
+    def test_mutuals(self):
+        self.alice.following.add(self.bob, self.carol)
+        self.bob.following.add(self.alice)
+        self.assertEqual(graph.get_mutual_ids(self.alice.pk), {self.bob.pk})
+
+    def test_suggestions_are_friends_of_friends(self):
+        self.alice.following.add(self.bob, self.carol)
+        self.bob.following.add(self.dave, self.alice)
+        self.carol.following.add(self.dave)
+        self.assertEqual(graph.suggest(self.alice.pk), [(self.dave.pk, 2)])
+        response = self.client.get(reverse('suggestions'))
+        self.assertEqual([user['username'] for user in response.data], ['dave'])
+        self.assertEqual(response.data[0]['followers_count'], 2)
+        self.assertFalse(response.data[0]['is_following'])
+
+    def test_suggestions_load_the_graph_once_per_page(self):
+        others = [User.objects.create_user(username=f'other{i}', password='password') for i in range(5)]
+        self.alice.following.add(self.bob)
+        self.bob.following.add(*others)
+        others[0].following.add(self.alice)
+        graph.clear()
+        # Alice's and Bob's following sets, the users, then the counts and
+        # following sets of every suggestion at once.
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('suggestions'))
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual({user['followers_count'] for user in response.data}, {1})
+        self.assertEqual([user['username'] for user in response.data if user['follows_you']], ['other0'])
+
+    def test_counts_do_not_load_id_sets(self):
+        self.bob.followers.add(self.alice, self.carol)
+        graph.clear()
+        self.assertEqual(graph.get_follower_counts_many([self.bob.pk, self.dave.pk]), {self.bob.pk: 2, self.dave.pk: 0})
+        self.assertEqual(len(graph._followers), 0)
+        self.carol.following.remove(self.bob)
+        self.assertEqual(graph.follower_count(self.bob.pk), 1)
+
+    def test_profile_counts(self):
+        self.alice.following.add(self.bob)
+        self.bob.following.add(self.alice)
+        response = self.client.get(reverse('profile'))
+        self.assertEqual((response.data['followers_count'], response.data['following_count']), (1, 1))
+
+
+class BulkFollowTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        graph.clear()
+        queue.get_queue().clear()
+        throttling.get_store().clear()
+        self.me = User.objects.create_user(username='me', password='password')
+        self.others = [User.objects.create_user(username=f'user{i}', password='password') for i in range(5)]
+        for other in self.others:
+            Post.objects.create(author=other, title=f'{other} post', content='content')
+        self.me.following.add(self.others[0])
+        self.client.force_authenticate(self.me)
+
+    def test_bulk_follow_reports_outcomes(self):
+        ids = [other.pk for other in self.others] + [self.me.pk, 99999]
+        timeline.get_celebrity_ids()
+        ContentType.objects.get_for_model(User)
+        # Validate ids, load following, then savepoint, insert, backfill, timeline insert, release.
+        with self.assertNumQueries(7):
+            response = self.client.post(reverse('bulk_follow'), {'user_ids': ids}, format='json')
+        outcomes = {row['user_id']: row['status'] for row in response.data['results']}
+        self.assertEqual(outcomes[self.others[0].pk], 'already_following')
+        self.assertEqual(outcomes[self.others[1].pk], 'followed')
+        self.assertEqual(outcomes[self.me.pk], 'self')
+        self.assertEqual(outcomes[99999], 'not_found')
+        self.assertEqual(self.me.following.count(), 5)
+        self.assertEqual(graph.following_count(self.me.pk), 5)
+        self.assertEqual(TimelineEntry.objects.filter(user=self.me).count(), 4)
+        self.assertEqual(len(queue.get_queue()), 4)
+
+    def test_bulk_unfollow(self):
+        ids = [self.others[0].pk, self.others[1].pk]
+        response = self.client.post(reverse('bulk_unfollow'), {'user_ids': ids}, format='json')
+        self.assertEqual(
+            [row['status'] for row in response.data['results']], ['unfollowed', 'not_following']
+        )
+        self.assertFalse(self.me.following.exists())
+        self.assertFalse(graph.get_following_ids(self.me.pk))
+
+    def test_bulk_endpoints_ignore_a_stale_graph_cache(self):
+        Follow = User.following.through
+        graph.get_following_ids(self.me.pk)
+        # Another process changes the follows; this process's cached set is not updated.
+        Follow.objects.filter(from_customuser=self.me).delete()
+        Follow.objects.create(from_customuser=self.me, to_customuser=self.others[1])
+        self.assertEqual(graph.get_following_ids(self.me.pk), {self.others[0].pk})
+
+        response = self.client.post(reverse('bulk_unfollow'), {'user_ids': [self.others[1].pk]}, format='json')
+        self.assertEqual(response.data['results'][0]['status'], 'unfollowed')
+        self.assertFalse(self.me.following.exists())
+        response = self.client.post(reverse('bulk_follow'), {'user_ids': [self.others[0].pk]}, format='json')
+        self.assertEqual(response.data['results'][0]['status'], 'followed')
+        self.assertEqual(list(self.me.following.all()), [self.others[0]])
+
+    def feed_titles(self):
+        return [post['title'] for post in self.client.get(reverse('feed')).data['results']]
+
+    def test_bulk_follow_invalidates_the_feed(self):
+        self.assertEqual(self.feed_titles(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('bulk_follow'), {'user_ids': [self.others[1].pk]}, format='json')
+        self.assertEqual(self.feed_titles(), [f'{self.others[1]} post'])
+
+    def test_bulk_unfollow_invalidates_the_feed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('bulk_follow'), {'user_ids': [self.others[1].pk]}, format='json')
+        self.assertEqual(self.feed_titles(), [f'{self.others[1]} post'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('bulk_unfollow'), {'user_ids': [self.others[1].pk]}, format='json')
+        self.assertEqual(self.feed_titles(), [])
+
+    def test_bulk_follow_validates_payload(self):
+        response = self.client.post(reverse('bulk_follow'), {'user_ids': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+# Unread counts are cached, so the only queries left would be authentication's.
+@mock.patch.object(counters, 'CACHE', 'default')
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        authentication.local_cache.clear()
+        self.user = User.objects.create_user(username='user', password='password')
+        self.token = Token.objects.create(user=self.user)
+        self.url = reverse('notifications_unread_count')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cached_token_adds_no_queries(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get(self.url)
+        self.token.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_stats_are_exposed_to_admins(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('auth_cache_stats'))
+        self.assertGreaterEqual(response.data['local']['hits'], 1)
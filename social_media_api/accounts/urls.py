@@ -1,5 +1,8 @@
 from django.urls import path
-from .views import RegisterView, LoginView, ProfileView, FollowUserView, UnfollowUserView
+from .views import (
+    RegisterView, LoginView, ProfileView, FollowUserView, UnfollowUserView, SuggestionsView,
+    BulkFollowView, BulkUnfollowView, AuthCacheStatsView,
+)
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
@@ -7,4 +10,8 @@ urlpatterns = [
     path('profile/', ProfileView.as_view(), name='profile'),
     path('follow/<int:user_id>/', FollowUserView.as_view(), name='follow_user'),
     path('unfollow/<int:user_id>/', UnfollowUserView.as_view(), name='unfollow_user'),
+    path('follow/bulk/', BulkFollowView.as_view(), name='bulk_follow'),
+    path('unfollow/bulk/', BulkUnfollowView.as_view(), name='bulk_unfollow'),
+    path('auth/cache-stats/', AuthCacheStatsView.as_view(), name='auth_cache_stats'),
+    path('suggestions/', SuggestionsView.as_view(), name='suggestions'),
 ]
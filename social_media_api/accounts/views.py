@@ -3,8 +3,13 @@ from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
 from django.contrib.auth import get_user_model
-from .serializers import RegisterSerializer, UserSerializer
-from notifications.models import Notification
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from common import authentication
+from . import graph
+from .serializers import RegisterSerializer, UserSerializer, BulkFollowSerializer
+from notifications import queue as notifications
+from posts import feed_cache, timeline
 from .models import CustomUser
 
 User = get_user_model()
@@ -46,27 +51,125 @@ class ProfileView(generics.RetrieveUpdateAPIView):
 class FollowUserView(generics.GenericAPIView):
     queryset = CustomUser.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'follow'
 
     def post(self, request, user_id):
         user_to_follow = CustomUser.objects.get(id=user_id)
         if user_to_follow == request.user:
             return Response({"error": "You cannot follow yourself."}, status=status.HTTP_400_BAD_REQUEST)
         request.user.following.add(user_to_follow)
+        timeline.backfill(request.user, user_to_follow)
         
         # Create notification
-        Notification.objects.create(
-            recipient=user_to_follow,
-            actor=request.user,
-            verb="started following you",
-            target=request.user
-        )
+        notifications.notify(user_to_follow, request.user, "started following you", request.user)
         return Response({"message": f"You are now following {user_to_follow.username}"}, status=status.HTTP_200_OK)
 
 class UnfollowUserView(generics.GenericAPIView):
     queryset = CustomUser.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'follow'
 
     def post(self, request, user_id):
         user_to_unfollow = CustomUser.objects.get(id=user_id)
         request.user.following.remove(user_to_unfollow)
+        timeline.prune(request.user, user_to_unfollow)
         return Response({"message": f"You have unfollowed {user_to_unfollow.username}"}, status=status.HTTP_200_OK)
+
+class BulkFollowView(generics.GenericAPIView):
+    """Follow up to 500 users in one request, reporting an outcome for each id."""
+    serializer_class = BulkFollowSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'bulk_follow'
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_ids = list(dict.fromkeys(serializer.validated_data['user_ids']))
+        me = request.user.pk
+        existing = set(CustomUser.objects.filter(id__in=user_ids, is_active=True).values_list('id', flat=True))
+        Follow = CustomUser.following.through
+
+        with transaction.atomic():
+            # Decided from the table: this process's graph cache may be stale.
+            already = set(
+                Follow.objects.filter(from_customuser=me, to_customuser__in=user_ids)
+                .values_list('to_customuser', flat=True)
+            )
+            results, to_follow = {}, []
+            for user_id in user_ids:
+                if user_id == me:
+                    results[user_id] = "self"
+                elif user_id not in existing:
+                    results[user_id] = "not_found"
+                elif user_id in already:
+                    results[user_id] = "already_following"
+                else:
+                    results[user_id] = "followed"
+                    to_follow.append(user_id)
+            if to_follow:
+                Follow.objects.bulk_create(
+                    [Follow(from_customuser_id=me, to_customuser_id=user_id) for user_id in to_follow],
+                    ignore_conflicts=True,
+                )
+                timeline.backfill_many(request.user, to_follow)
+                # bulk_create bypasses m2m_changed, which clears the feed cache for follow().
+                transaction.on_commit(lambda: feed_cache.invalidate([me]))
+
+        if to_follow:
+            # bulk_create bypasses m2m_changed, so update the graph cache directly.
+            graph.record_follows((me, user_id) for user_id in to_follow)
+            content_type_id = ContentType.objects.get_for_model(request.user).pk
+            notifications.enqueue([
+                notifications.NotificationIntent(user_id, me, "started following you", content_type_id, me)
+                for user_id in to_follow
+            ])
+        return Response(
+            {"results": [{"user_id": user_id, "status": outcome} for user_id, outcome in results.items()]},
+            status=status.HTTP_200_OK,
+        )
+
+class BulkUnfollowView(generics.GenericAPIView):
+    serializer_class = BulkFollowSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'bulk_follow'
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_ids = list(dict.fromkeys(serializer.validated_data['user_ids']))
+        with transaction.atomic():
+            follows = CustomUser.following.through.objects.filter(
+                from_customuser=request.user, to_customuser__in=user_ids
+            )
+            # Decided from the table: this process's graph cache may be stale.
+            following = set(follows.values_list('to_customuser', flat=True))
+            to_unfollow = [user_id for user_id in user_ids if user_id in following]
+            if to_unfollow:
+                follows.delete()
+                timeline.prune_many(request.user, to_unfollow)
+                transaction.on_commit(lambda: feed_cache.invalidate([request.user.pk]))
+        if to_unfollow:
+            graph.record_unfollows((request.user.pk, user_id) for user_id in to_unfollow)
+        return Response(
+            {"results": [
+                {"user_id": user_id, "status": "unfollowed" if user_id in following else "not_following"}
+                for user_id in user_ids
+            ]},
+            status=status.HTTP_200_OK,
+        )
+
+class SuggestionsView(generics.ListAPIView):
+    serializer_class = UserSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        suggested = [user_id for user_id, _ in graph.suggest(self.request.user.pk)]
+        users = CustomUser.objects.in_bulk(suggested)
+        return [users[user_id] for user_id in suggested if user_id in users]
+
+class AuthCacheStatsView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(authentication.stats())
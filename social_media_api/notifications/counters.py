@@ -0,0 +1,59 @@
+"""
+Cached per-user unread notification counts.
+
+Counts live in the cache alias named by ``UNREAD_COUNTERS['CACHE']``
+(``default`` unless configured), which must be shared by every process (Redis,
+Memcached, a database cache); with ``None`` every read is a count over the
+``(recipient, unread, timestamp)`` index. A cached count is stored under a per-user version token
+that is replaced, after commit, whenever the user's unread notifications change.
+The new token is written before anything reads under it, so a count computed
+concurrently with a change lands under the old token and is never read.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+COUNTER_SETTINGS = getattr(settings, 'UNREAD_COUNTERS', {})
+CACHE = COUNTER_SETTINGS.get('CACHE', 'default')
+TIMEOUT = COUNTER_SETTINGS.get('TIMEOUT', 300)
+
+VERSION_KEY = 'notifications:unread:version:{}'
+COUNT_KEY = 'notifications:unread:{}:{}'
+
+
+def get_cache():
+    return caches[CACHE] if CACHE else None
+
+
+def _new_version():
+    return uuid.uuid4().hex
+
+
+def get_unread_count(user):
+    cache = get_cache()
+    if cache is None:
+        return user.notifications.filter(unread=True).count()
+    version_key = VERSION_KEY.format(user.pk)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, _new_version(), None)
+        version = cache.get(version_key)
+    key = COUNT_KEY.format(user.pk, version)
+    count = cache.get(key)
+    if count is None:
+        count = user.notifications.filter(unread=True).count()
+        cache.set(key, count, TIMEOUT)
+    return count
+
+
+def invalidate(user_ids):
+    """Drop the cached counts of ``user_ids`` once the current transaction commits."""
+    cache = get_cache()
+    if cache is None:
+        return
+    user_ids = set(user_ids)
+    transaction.on_commit(
+        lambda: cache.set_many({VERSION_KEY.format(user_id): _new_version() for user_id in user_ids}, None)
+    )
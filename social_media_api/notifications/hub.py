@@ -0,0 +1,79 @@
+"""
+Pub/sub hub that pushes new notifications to connected SSE and WebSocket clients.
+
+Each open stream subscribes with an ``asyncio.Queue`` on its own event loop, so
+one ASGI worker can hold many idle connections. Publishing is thread-safe and is
+done by the notification queue worker after it writes a batch.
+
+The broker is pluggable through ``NOTIFICATIONS_HUB['BACKEND']``; it must
+implement ``subscribe``, ``unsubscribe``, ``has_subscribers`` and ``publish``.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+HUB_SETTINGS = getattr(settings, 'NOTIFICATIONS_HUB', {})
+MAX_PENDING = HUB_SETTINGS.get('MAX_PENDING', 100)
+
+
+class Subscription:
+    def __init__(self, recipient_id):
+        self.recipient_id = recipient_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=MAX_PENDING)
+
+    def deliver(self, event):
+        # Slow consumers drop events rather than grow without bound.
+        if not self.queue.full():
+            self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class LocalBroker:
+    """In-process broker; a stand-in for a shared one such as Redis pub/sub."""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, recipient_id):
+        subscription = Subscription(recipient_id)
+        with self._lock:
+            self._subscriptions[recipient_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.recipient_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.recipient_id]
+
+    def has_subscribers(self, recipient_id):
+        return recipient_id in self._subscriptions
+
+    def publish(self, recipient_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(recipient_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's event loop has already shut down.
+                self.unsubscribe(subscription)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(HUB_SETTINGS.get('BACKEND', 'notifications.hub.LocalBroker'))()
+    return _broker
@@ -11,6 +11,13 @@ class Notification(models.Model):
     target_object_id = models.PositiveIntegerField(null=True, blank=True)
     target = GenericForeignKey('target_content_type', 'target_object_id')
     timestamp = models.DateTimeField(auto_now_add=True)
+    unread = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', '-timestamp', '-id'], name='notification_recipient_idx'),
+            models.Index(fields=['recipient', 'unread', '-timestamp'], name='notification_unread_idx'),
+        ]
 
     def __str__(self):
         return f'{self.actor} {self.verb} {self.target} to {self.recipient}'
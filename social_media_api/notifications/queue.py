@@ -0,0 +1,181 @@
+"""
+Queued notification delivery.
+
+Views enqueue lightweight notification intents instead of inserting rows inside
+the request. After the request's transaction commits, a background worker drains
+the queue, collapses duplicates ("alice and 4 others liked your post") and writes
+the result with ``bulk_create``.
+
+The queue backend is pluggable through ``NOTIFICATIONS_QUEUE['BACKEND']``; it
+must implement ``put_many``, ``get_batch`` and ``clear``.
+
+A batch that fails to insert is put back on the queue for the next flush. When
+the failure is an integrity error, typically a recipient, actor or target that
+was deleted after the intent was queued, the batch's notifications are written
+one at a time instead and the ones that still fail are logged and dropped.
+"""
+import logging
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import prefetch_related_objects
+from django.utils.module_loading import import_string
+
+from . import counters
+from .hub import get_broker
+from .models import Notification
+from .serializers import NotificationSerializer
+
+logger = logging.getLogger(__name__)
+
+NotificationIntent = namedtuple(
+    'NotificationIntent',
+    ['recipient_id', 'actor_id', 'verb', 'target_content_type_id', 'target_object_id'],
+)
+
+
+class LocalQueue:
+    """Thread-safe in-process FIFO, suitable for a single process and for tests."""
+
+    def __init__(self):
+        self._items = deque()
+        self._lock = threading.Lock()
+
+    def put_many(self, intents):
+        with self._lock:
+            self._items.extend(intents)
+
+    def get_batch(self, size):
+        with self._lock:
+            return [self._items.popleft() for _ in range(min(size, len(self._items)))]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+QUEUE_SETTINGS = getattr(settings, 'NOTIFICATIONS_QUEUE', {})
+BATCH_SIZE = QUEUE_SETTINGS.get('BATCH_SIZE', 500)
+AUTO_FLUSH = QUEUE_SETTINGS.get('AUTO_FLUSH', True)
+
+_queue = None
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='notifications')
+
+
+def get_queue():
+    global _queue
+    if _queue is None:
+        _queue = import_string(QUEUE_SETTINGS.get('BACKEND', 'notifications.queue.LocalQueue'))()
+    return _queue
+
+
+def build_intent(recipient, actor, verb, target=None):
+    content_type_id = object_id = None
+    if target is not None:
+        content_type_id = ContentType.objects.get_for_model(target).pk
+        object_id = target.pk
+    return NotificationIntent(recipient.pk, actor.pk, verb, content_type_id, object_id)
+
+
+def notify(recipient, actor, verb, target=None):
+    enqueue([build_intent(recipient, actor, verb, target)])
+
+
+def enqueue(intents):
+    get_queue().put_many(intents)
+    if AUTO_FLUSH:
+        transaction.on_commit(lambda: _executor.submit(_flush_in_worker))
+
+
+def _flush_in_worker():
+    try:
+        flush()
+    except Exception:
+        # Nobody reads the worker's future, so this is the only trace of the failure.
+        logger.exception('Flushing queued notifications failed; the failed batch was re-queued.')
+    finally:
+        close_old_connections()
+
+
+def collapse(intents):
+    """
+    Merge intents that share a recipient, verb and target into one notification
+    naming the most recent actor. Repeats by the same actor are dropped.
+    """
+    groups = {}
+    for intent in intents:
+        key = (intent.recipient_id, intent.verb, intent.target_content_type_id, intent.target_object_id)
+        actors = groups.setdefault(key, {})
+        actors.pop(intent.actor_id, None)
+        actors[intent.actor_id] = None
+    notifications = []
+    for (recipient_id, verb, content_type_id, object_id), actors in groups.items():
+        actor_ids = list(actors)
+        others = len(actor_ids) - 1
+        if others:
+            verb = f"and {others} other{'s' if others > 1 else ''} {verb}"
+        notifications.append(Notification(
+            recipient_id=recipient_id,
+            actor_id=actor_ids[-1],
+            verb=verb,
+            target_content_type_id=content_type_id,
+            target_object_id=object_id,
+        ))
+    return notifications
+
+
+def flush(batch_size=None):
+    """Drain the queue, returning the number of notifications written."""
+    queue = get_queue()
+    batch_size = batch_size or BATCH_SIZE
+    written = 0
+    while True:
+        intents = queue.get_batch(batch_size)
+        if not intents:
+            return written
+        try:
+            created = write(collapse(intents))
+        except Exception:
+            queue.put_many(intents)
+            raise
+        counters.invalidate(notification.recipient_id for notification in created)
+        publish(created)
+        written += len(created)
+
+
+def write(notifications):
+    try:
+        return Notification.objects.bulk_create(notifications)
+    except IntegrityError:
+        pass
+    created = []
+    for notification in notifications:
+        try:
+            with transaction.atomic():
+                Notification.objects.bulk_create([notification])
+        except IntegrityError:
+            logger.exception(
+                'Dropping notification %r for recipient %s from actor %s.',
+                notification.verb, notification.recipient_id, notification.actor_id,
+            )
+        else:
+            created.append(notification)
+    return created
+
+
+def publish(notifications):
+    """Push freshly written notifications to recipients with an open stream."""
+    broker = get_broker()
+    live = [notification for notification in notifications if broker.has_subscribers(notification.recipient_id)]
+    if not live:
+        return
+    prefetch_related_objects(live, 'actor', 'target')
+    for notification, event in zip(live, NotificationSerializer(live, many=True).data):
+        broker.publish(notification.recipient_id, event)
@@ -1,9 +1,46 @@
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
 from rest_framework import serializers
 from .models import Notification
 
 class NotificationSerializer(serializers.ModelSerializer):
     actor = serializers.ReadOnlyField(source='actor.username')
-    
+    target = serializers.SerializerMethodField()
+
     class Meta:
         model = Notification
-        fields = ('id', 'actor', 'verb', 'target', 'timestamp')
+        fields = ('id', 'actor', 'verb', 'target', 'timestamp', 'unread')
+
+    # Read by load_target when the serializer is compiled.
+    compiled_values = ('target_content_type', 'target_object_id')
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # Generic targets are prefetched with one query per content type.
+        return queryset.select_related('actor').prefetch_related('target')
+
+    @staticmethod
+    def represent_target(target):
+        if target is None:
+            return None
+        return {'id': target.pk, 'type': target._meta.model_name, 'title': str(target)}
+
+    def get_target(self, obj):
+        return self.represent_target(obj.target)
+
+    @staticmethod
+    def load_target(rows, context):
+        # Compiled counterpart of the target prefetch: one query per content type.
+        object_ids = defaultdict(set)
+        for row in rows:
+            if row['target_content_type'] is not None:
+                object_ids[row['target_content_type']].add(row['target_object_id'])
+        targets = {}
+        for content_type_id, ids in object_ids.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            for target in model._base_manager.filter(pk__in=ids):
+                targets[content_type_id, target.pk] = target
+        for row in rows:
+            target = targets.get((row['target_content_type'], row['target_object_id']))
+            row['target'] = NotificationSerializer.represent_target(target)
@@ -0,0 +1,103 @@
+"""
+Server-Sent Events and WebSocket streams of new notifications.
+
+Both need an ASGI server (e.g. ``uvicorn social_media_api.asgi:application``).
+Clients authenticate with their API token, either in an ``Authorization: Token
+<key>`` header or, since browsers cannot set headers on ``EventSource`` and
+WebSocket connections, a ``?token=<key>`` query parameter.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework.authtoken.models import Token
+
+from .hub import HUB_SETTINGS, get_broker
+
+KEEPALIVE_INTERVAL = HUB_SETTINGS.get('KEEPALIVE_INTERVAL', 15)
+WEBSOCKET_PATH = HUB_SETTINGS.get('WEBSOCKET_PATH', '/ws/notifications/')
+
+
+@sync_to_async
+def get_user_for_token(key):
+    if not key:
+        return None
+    token = Token.objects.select_related('user').filter(key=key).first()
+    if token is None or not token.user.is_active:
+        return None
+    return token.user
+
+
+def token_from_request(request):
+    scheme, _, key = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() == 'token' and key:
+        return key.strip()
+    return request.GET.get('token')
+
+
+def encode(event):
+    return json.dumps(event, cls=DjangoJSONEncoder)
+
+
+async def sse_events(recipient_id):
+    broker = get_broker()
+    subscription = broker.subscribe(recipient_id)
+    try:
+        yield f'retry: {KEEPALIVE_INTERVAL * 1000}\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield f"id: {event['id']}\nevent: notification\ndata: {encode(event)}\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def notification_stream(request):
+    user = await get_user_for_token(token_from_request(request))
+    if user is None:
+        return HttpResponse(status=401)
+    response = StreamingHttpResponse(sse_events(user.pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def websocket_application(scope, receive, send):
+    """Minimal ASGI WebSocket handler pushing the same events as the SSE stream."""
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    if scope['path'] != WEBSOCKET_PATH:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    user = await get_user_for_token(query.get('token', [None])[0])
+    if user is None:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+    await send({'type': 'websocket.accept'})
+
+    broker = get_broker()
+    subscription = broker.subscribe(user.pk)
+    next_message = asyncio.ensure_future(receive())
+    next_event = asyncio.ensure_future(subscription.get())
+    try:
+        while True:
+            done, _ = await asyncio.wait({next_message, next_event}, return_when=asyncio.FIRST_COMPLETED)
+            if next_event in done:
+                await send({'type': 'websocket.send', 'text': encode(next_event.result())})
+                next_event = asyncio.ensure_future(subscription.get())
+            if next_message in done:
+                if next_message.result()['type'] == 'websocket.disconnect':
+                    break
+                next_message = asyncio.ensure_future(receive())
+    finally:
+        next_message.cancel()
+        next_event.cancel()
+        broker.unsubscribe(subscription)
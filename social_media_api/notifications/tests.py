@@ -1,3 +1,215 @@
-from django.test import TestCase
+import asyncio
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, OperationalError
+from django.db.models import QuerySet
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from posts.models import Post
+from common.compiled import get_compiled
+from . import counters, queue
+from .hub import get_broker
+from .stream import sse_events, websocket_application
+from .models import Notification
+from .serializers import NotificationSerializer
+
+User = get_user_model()
+
+
+class NotificationQueueTests(APITestCase):
+    def setUp(self):
+        queue.get_queue().clear()
+        self.author = User.objects.create_user(username='author', password='password')
+        self.post = Post.objects.create(author=self.author, title='Post', content='content')
+        self.fans = [User.objects.create_user(username=f'fan{i}', password='password') for i in range(5)]
+
+    def test_views_enqueue_instead_of_inserting(self):
+        self.client.force_authenticate(self.fans[0])
+        self.client.post(reverse('like_post', args=[self.post.pk]))
+        self.client.post(reverse('follow_user', args=[self.author.pk]))
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(len(queue.get_queue()), 2)
+        self.assertEqual(queue.flush(), 2)
+        self.assertEqual(self.author.notifications.count(), 2)
+
+    def test_flush_collapses_duplicates(self):
+        for fan in self.fans:
+            queue.notify(self.author, fan, 'liked your post', self.post)
+        queue.notify(self.author, self.fans[0], 'liked your post', self.post)
+        with self.assertNumQueries(1):
+            self.assertEqual(queue.flush(batch_size=100), 1)
+        notification = self.author.notifications.get()
+        self.assertEqual(notification.actor, self.fans[0])
+        self.assertEqual(notification.verb, 'and 4 others liked your post')
+        self.assertEqual(notification.target, self.post)
+
+    def test_flush_drains_in_batches(self):
+        for fan in self.fans:
+            queue.notify(self.author, fan, 'started following you', fan)
+        self.assertEqual(queue.flush(batch_size=2), 5)
+        self.assertEqual(len(queue.get_queue()), 0)
+
+    def test_failed_batch_is_requeued_and_logged(self):
+        for fan in self.fans[:2]:
+            queue.notify(self.author, fan, 'started following you', fan)
+        with mock.patch.object(Notification.objects, 'bulk_create', side_effect=OperationalError('gone')):
+            with self.assertLogs('notifications.queue', 'ERROR'):
+                queue._flush_in_worker()
+        self.assertEqual(len(queue.get_queue()), 2)
+        self.assertEqual(queue.flush(), 2)
+        self.assertEqual(self.author.notifications.count(), 2)
+
+    def test_integrity_errors_only_drop_the_failing_notifications(self):
+        for fan in self.fans[:3]:
+            queue.notify(self.author, fan, 'started following you', fan)
+        bulk_create = Notification.objects.bulk_create
+
+        def fail_for_first_fan(notifications):
+            if any(notification.actor_id == self.fans[0].pk for notification in notifications):
+                raise IntegrityError('FOREIGN KEY constraint failed')
+            return bulk_create(notifications)
+
+        with mock.patch.object(Notification.objects, 'bulk_create', side_effect=fail_for_first_fan):
+            with self.assertLogs('notifications.queue', 'ERROR') as logs:
+                self.assertEqual(queue.flush(), 2)
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(len(queue.get_queue()), 0)
+        self.assertEqual(
+            set(self.author.notifications.values_list('actor', flat=True)), {self.fans[1].pk, self.fans[2].pk}
+        )
+
+
+class UnreadCountTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        queue.get_queue().clear()
+        self.user = User.objects.create_user(username='user', password='password')
+        self.fans = [User.objects.create_user(username=f'fan{i}', password='password') for i in range(3)]
+        self.client.force_authenticate(self.user)
+
+    def unread_count(self):
+        return self.client.get(reverse('notifications_unread_count')).data['unread_count']
+
+    def notify(self, fans):
+        with self.captureOnCommitCallbacks(execute=True):
+            for fan in fans:
+                queue.notify(self.user, fan, 'started following you', fan)
+            queue.flush()
+
+    @mock.patch.object(counters, 'CACHE', None)
+    def test_counts_from_the_database_without_a_cache(self):
+        self.notify(self.fans)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.unread_count(), 3)
+
+    def test_counter_is_cached_and_invalidated(self):
+        self.notify(self.fans[:1])
+        self.assertEqual(self.unread_count(), 1)
+        self.notify(self.fans[1:])
+        self.assertEqual(self.unread_count(), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.unread_count(), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('notifications_mark_all_read'))
+        self.assertEqual(response.data['marked_read'], 3)
+        self.assertEqual(self.unread_count(), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.unread_count(), 0)
+        self.assertFalse(self.user.notifications.filter(unread=True).exists())
+
+    def test_count_computed_during_a_write_is_not_kept(self):
+        count = QuerySet.count
+
+        def count_then_notify(queryset):
+            # A notification is written after this count but before it is cached.
+            result = count(queryset)
+            self.notify(self.fans[:1])
+            return result
+
+        with mock.patch.object(QuerySet, 'count', count_then_notify):
+            self.assertEqual(counters.get_unread_count(self.user), 0)
+        self.assertEqual(self.unread_count(), 1)
+
+
+class NotificationListTests(APITestCase):
+    def setUp(self):
+        queue.get_queue().clear()
+        self.user = User.objects.create_user(username='user', password='password')
+        self.fan = User.objects.create_user(username='fan', password='password')
+        posts = Post.objects.bulk_create(
+            Post(author=self.user, title=f'Post {i}', content='content') for i in range(25)
+        )
+        for post in posts:
+            queue.notify(self.user, self.fan, 'liked your post', post)
+            queue.notify(self.user, self.fan, 'commented on your post', post)
+        queue.notify(self.user, self.fan, 'started following you', self.fan)
+        queue.flush()
+        self.client.force_authenticate(self.user)
+
+    def test_targets_are_loaded_in_bulk(self):
+        # Notifications with their actors, then one query per target content type.
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('notifications') + '?page_size=51')
+        results = response.data['results']
+        self.assertEqual(len(results), 51)
+        self.assertEqual(results[0]['target'], {'id': self.fan.pk, 'type': 'customuser', 'title': 'fan'})
+        self.assertEqual(results[1]['target']['type'], 'post')
+
+    def test_compiled_output_matches_serializer(self):
+        post = Post.objects.create(author=self.user, title='Deleted', content='content')
+        Notification.objects.create(recipient=self.user, actor=self.fan, verb='liked your post', target=post)
+        Notification.objects.create(recipient=self.user, actor=self.fan, verb='said hello')
+        post.delete()
+        queryset = Notification.objects.filter(recipient=self.user).order_by('-timestamp', '-id')
+        expected = NotificationSerializer(NotificationSerializer.setup_eager_loading(queryset), many=True).data
+        compiled = get_compiled(NotificationSerializer).serialize(queryset)
+        self.assertEqual(len(compiled), 53)
+        self.assertEqual(JSONRenderer().render(compiled), JSONRenderer().render(expected))
+
+
+class NotificationStreamTests(APITestCase):
+    def setUp(self):
+        queue.get_queue().clear()
+        self.user = User.objects.create_user(username='user', password='password')
+        self.fan = User.objects.create_user(username='fan', password='password')
+        self.token = Token.objects.create(user=self.user)
+
+    def test_stream_requires_token(self):
+        response = self.client.get(reverse('notifications_stream'))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_sse_pushes_new_notifications(self):
+        response = await self.async_client.get(reverse('notifications_stream'), {'token': self.token.key})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        events = sse_events(self.user.pk)
+        self.assertTrue((await anext(events)).startswith('retry:'))
+        await sync_to_async(queue.notify)(self.user, self.fan, 'started following you', self.fan)
+        await sync_to_async(queue.flush)()
+        event = await asyncio.wait_for(anext(events), 1)
+        self.assertIn('event: notification', event)
+        self.assertIn('"verb": "started following you"', event)
+        await events.aclose()
+        self.assertFalse(get_broker().has_subscribers(self.user.pk))
+
+    async def test_websocket_pushes_new_notifications(self):
+        incoming, outgoing = asyncio.Queue(), asyncio.Queue()
+        scope = {'type': 'websocket', 'path': '/ws/notifications/', 'query_string': f'token={self.token.key}'.encode()}
+        await incoming.put({'type': 'websocket.connect'})
+        task = asyncio.ensure_future(websocket_application(scope, incoming.get, outgoing.put))
+        self.assertEqual((await asyncio.wait_for(outgoing.get(), 1))['type'], 'websocket.accept')
+
+        await sync_to_async(queue.notify)(self.user, self.fan, 'started following you', self.fan)
+        await sync_to_async(queue.flush)()
+        message = await asyncio.wait_for(outgoing.get(), 1)
+        self.assertIn('started following you', message['text'])
+        await incoming.put({'type': 'websocket.disconnect'})
+        await asyncio.wait_for(task, 1)
+        self.assertFalse(get_broker().has_subscribers(self.user.pk))
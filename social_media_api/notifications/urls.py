@@ -1,6 +1,10 @@
 from django.urls import path
-from .views import NotificationListView
+from .stream import notification_stream
+from .views import NotificationListView, UnreadCountView, MarkAllReadView
 
 urlpatterns = [
     path('', NotificationListView.as_view(), name='notifications'),
+    path('unread-count/', UnreadCountView.as_view(), name='notifications_unread_count'),
+    path('stream/', notification_stream, name='notifications_stream'),
+    path('mark-all-read/', MarkAllReadView.as_view(), name='notifications_mark_all_read'),
 ]
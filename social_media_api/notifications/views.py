@@ -1,10 +1,29 @@
 from rest_framework import generics, permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from common.compiled import CompiledListMixin
+from . import counters
 from .models import Notification
 from .serializers import NotificationSerializer
 
-class NotificationListView(generics.ListAPIView):
+class NotificationListView(CompiledListMixin, generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('-timestamp', '-id')
 
     def get_queryset(self):
-        return self.request.user.notifications.all().order_by('-timestamp')
+        return NotificationSerializer.setup_eager_loading(self.request.user.notifications.all())
+
+class UnreadCountView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response({"unread_count": counters.get_unread_count(request.user)})
+
+class MarkAllReadView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        updated = request.user.notifications.filter(unread=True).update(unread=False)
+        counters.invalidate([request.user.pk])
+        return Response({"marked_read": updated})
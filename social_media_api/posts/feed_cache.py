@@ -0,0 +1,99 @@
+"""
+Per-user cache of rendered feed pages.
+
+Pages are stored in the Django cache named by ``FEED_CACHE['CACHE']`` (locmem
+in a single process, a file-based or shared cache such as Redis when several
+workers serve the API) under a key made of the user, the request path, which
+carries the cursor and page size, and a version token. Invalidating a feed
+replaces the version token, so every cached page of that feed goes stale in one
+write and no key enumeration is needed. Posts by authors above the fan-out
+threshold are merged at read time, so each of those authors has a token of
+their own that is part of the key of every reader following them; activity on
+a celebrity's posts only invalidates their followers' feeds.
+
+A cache miss takes a short lock with ``cache.add`` before recomputing; a burst
+of refreshes waits for that one recomputation instead of repeating it.
+"""
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from accounts import graph
+
+CACHE_SETTINGS = getattr(settings, 'FEED_CACHE', {})
+TIMEOUT = CACHE_SETTINGS.get('TIMEOUT', 30)
+LOCK_TIMEOUT = CACHE_SETTINGS.get('LOCK_TIMEOUT', 10)
+LOCK_WAIT = CACHE_SETTINGS.get('LOCK_WAIT', 2)
+POLL_INTERVAL = 0.05
+
+VERSION_KEY = 'posts:feed:version:{}'
+AUTHOR_VERSION_KEY = 'posts:feed:version:author:{}'
+PAGE_KEY = 'posts:feed:page:{}:{}:{}'
+
+
+def get_cache():
+    return caches[CACHE_SETTINGS.get('CACHE', 'default')]
+
+
+def _new_version():
+    return uuid.uuid4().hex
+
+
+def _get_versions(cache, user_id, celebrity_ids):
+    followed = sorted(graph.get_following_ids(user_id) & set(celebrity_ids)) if celebrity_ids else []
+    keys = [VERSION_KEY.format(user_id)] + [AUTHOR_VERSION_KEY.format(author_id) for author_id in followed]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # add() keeps a token another process set in the meantime.
+            cache.add(key, _new_version(), None)
+            versions[key] = cache.get(key)
+    return '.'.join(versions[key] for key in keys)
+
+
+def page_key(cache, user_id, path, celebrity_ids=()):
+    digest = hashlib.md5(path.encode('utf-8'), usedforsecurity=False).hexdigest()
+    return PAGE_KEY.format(user_id, _get_versions(cache, user_id, celebrity_ids), digest)
+
+
+def get_or_compute(user_id, path, compute, celebrity_ids=()):
+    """
+    Return the cached page for ``user_id`` and ``path``, calling ``compute`` on a
+    miss. ``celebrity_ids`` are the authors merged into feeds at read time.
+    """
+    cache = get_cache()
+    key = page_key(cache, user_id, path, celebrity_ids)
+    entry = cache.get(key)
+    if entry is not None:
+        return entry
+    lock_key = key + ':lock'
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry
+        # The lock holder is slow or died; serve this request without caching.
+        return compute()
+    try:
+        entry = compute()
+        cache.set(key, entry, TIMEOUT)
+    finally:
+        cache.delete(lock_key)
+    return entry
+
+
+def invalidate(user_ids):
+    get_cache().set_many({VERSION_KEY.format(user_id): _new_version() for user_id in user_ids}, None)
+
+
+def invalidate_author(author_id, celebrity_ids):
+    """Invalidate every feed that shows posts by ``author_id``."""
+    if author_id in celebrity_ids:
+        get_cache().set(AUTHOR_VERSION_KEY.format(author_id), _new_version(), None)
+    else:
+        invalidate(graph.get_follower_ids(author_id))
@@ -0,0 +1,62 @@
+"""
+Idempotent like/unlike.
+
+Each toggle is a conditional write followed by a counter update, both with
+``RETURNING``, inside one transaction. The unique ``(user, post)`` constraint
+decides which of two concurrent likes wins (``ON CONFLICT DO NOTHING``), and
+only the statement that actually inserted or deleted a row moves
+``like_count``, so double taps can neither duplicate a like nor skew the count.
+Both statements are supported by PostgreSQL and by SQLite 3.35+.
+"""
+from django.db import connection, transaction
+
+from .models import Like, Post
+
+
+def _tables():
+    quote = connection.ops.quote_name
+    return quote(Like._meta.db_table), quote(Post._meta.db_table)
+
+
+def _update_count(cursor, post_id, delta):
+    _, posts = _tables()
+    if delta:
+        cursor.execute(
+            f'UPDATE {posts} SET like_count = like_count + %s WHERE id = %s RETURNING like_count, author_id',
+            [delta, post_id],
+        )
+    else:
+        cursor.execute(f'SELECT like_count, author_id FROM {posts} WHERE id = %s', [post_id])
+    row = cursor.fetchone()
+    if row is None:
+        raise Post.DoesNotExist
+    return row
+
+
+def like(user_id, post_id):
+    """
+    Like a post. Returns ``(created, like_count, author_id)``; raises
+    ``Post.DoesNotExist`` for a missing post.
+    """
+    likes, posts = _tables()
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Selecting from the post table makes a missing post insert nothing
+        # instead of failing a (possibly deferred) foreign key check.
+        cursor.execute(
+            f'INSERT INTO {likes} (user_id, post_id) SELECT %s, id FROM {posts} WHERE id = %s '
+            f'ON CONFLICT (user_id, post_id) DO NOTHING RETURNING id',
+            [user_id, post_id],
+        )
+        created = cursor.fetchone() is not None
+        like_count, author_id = _update_count(cursor, post_id, 1 if created else 0)
+    return created, like_count, author_id
+
+
+def unlike(user_id, post_id):
+    """Unlike a post. Returns ``(deleted, like_count, author_id)``."""
+    likes, _ = _tables()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {likes} WHERE user_id = %s AND post_id = %s RETURNING id', [user_id, post_id])
+        deleted = cursor.fetchone() is not None
+        like_count, author_id = _update_count(cursor, post_id, -1 if deleted else 0)
+    return deleted, like_count, author_id
@@ -0,0 +1,274 @@
+import asyncio
+import json
+import platform
+import random
+import statistics
+import threading
+import time
+import tracemalloc
+from io import StringIO
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from asgiref.sync import sync_to_async
+from rest_framework.authtoken.models import Token
+
+from accounts import graph
+from notifications import counters, queue as notifications
+from posts import feed_cache
+from posts.models import Comment, Like, Post
+from common import authentication
+from social_media_api import throttling
+
+User = get_user_model()
+Follow = User.following.through
+
+
+class QueryCounter:
+    """Counts queries on every connection, including those opened by the ASGI client's worker threads."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self, connection, **kwargs):
+        # Outermost, because connection.execute_wrapper() pops the last wrapper on
+        # exit: an ASGI worker's connection is opened inside the instrumentation
+        # middleware's block, and appending would have it pop this one instead.
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, self)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed synthetic data and measure latency percentiles, queries per request and '
+        'allocations of the main endpoints through the WSGI and ASGI test clients.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--follows-per-user', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--likes', type=int, default=50000)
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint and client.')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        parser.add_argument('--baseline', help='A previous JSON report to compare against.')
+        parser.add_argument(
+            '--max-regression', type=float,
+            help='Fail if any p95 grows by more than this percentage over the baseline.',
+        )
+        parser.add_argument(
+            '--use-current-database', action='store_true',
+            help='Seed and run against the configured database instead of a throwaway test database.',
+        )
+        parser.add_argument('--no-seed', action='store_true', help='Benchmark the existing data as is.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        try:
+            # Lets the test clients through ALLOWED_HOSTS.
+            setup_test_environment()
+            owns_environment = True
+        except RuntimeError:
+            owns_environment = False  # already running under the test runner
+        test_db = None
+        if not options['use_current_database']:
+            test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            if not options['no_seed']:
+                self.seed(options)
+            report = self.run(options)
+        finally:
+            if test_db is not None:
+                connection.creation.destroy_test_db(test_db, verbosity=0)
+            if owns_environment:
+                teardown_test_environment()
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        if options['baseline']:
+            self.compare(report, options['baseline'], options['max_regression'])
+
+    def seed(self, options):
+        start = time.perf_counter()
+        call_command(
+            'seed_social', users=options['users'], follows_per_user=options['follows_per_user'],
+            posts=options['posts'], comments=options['comments'], likes=options['likes'],
+            seed=options['seed'], prefix='bench', stdout=self.stdout if options['verbosity'] > 1 else StringIO(),
+        )
+        self.stderr.write(f'Seeded in {time.perf_counter() - start:.1f}s')
+
+    def get_tokens(self, count):
+        users = User.objects.order_by('id')[:count]
+        return [Token.objects.get_or_create(user=user)[0] for user in users]
+
+    def get_scenarios(self):
+        post_ids = list(Post.objects.values_list('id', flat=True)[:1000])
+        if not post_ids:
+            raise CommandError('There are no posts to benchmark; seed some first.')
+        rng = self.random
+        return {
+            'feed': lambda: ('get', reverse('feed')),
+            'post_list': lambda: ('get', reverse('post-list')),
+            'post_search': lambda: ('get', reverse('post-list') + '?search=python'),
+            'like': lambda: ('post', reverse('like_post', args=[rng.choice(post_ids)])),
+            'notifications': lambda: ('get', reverse('notifications')),
+        }
+
+    def run(self, options):
+        counter = QueryCounter()
+        connection_created.connect(counter.install)
+        for conn in connections.all():
+            counter.install(conn)
+        # Spread requests over many users so per-user throttles never kick in.
+        tokens = self.get_tokens(min(User.objects.count(), 200))
+        results = {}
+        # Notifications are written between requests instead of by the background worker,
+        # so their writes neither overlap nor get timed with the measured requests.
+        auto_flush, notifications.AUTO_FLUSH = notifications.AUTO_FLUSH, False
+        try:
+            for name, make_request in self.get_scenarios().items():
+                self.reset_caches(tokens)
+                results[f'{name}:wsgi'] = self.measure(Client(), make_request, tokens, counter, options)
+                self.reset_caches(tokens)
+                results[f'{name}:asgi'] = asyncio.run(
+                    self.measure_async(AsyncClient(), make_request, tokens, counter, options)
+                )
+        finally:
+            notifications.AUTO_FLUSH = auto_flush
+            connection_created.disconnect(counter.install)
+            for conn in connections.all():
+                if counter in conn.execute_wrappers:
+                    conn.execute_wrappers.remove(counter)
+        return {
+            'meta': {
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'seed': options['seed'],
+                'rows': {
+                    'users': User.objects.count(),
+                    'follows': Follow.objects.count(),
+                    'posts': Post.objects.count(),
+                    'comments': Comment.objects.count(),
+                    'likes': Like.objects.count(),
+                },
+            },
+            'results': results,
+        }
+
+    def reset_caches(self, tokens):
+        # Start each run cold so the feed cache doesn't favour whichever client runs second.
+        # Only what the benchmark users populated is dropped: with --use-current-database
+        # the caches may be shared with a running site.
+        user_ids = [token.user_id for token in tokens]
+        feed_cache.invalidate(user_ids)
+        counters.invalidate(user_ids)
+        authentication.invalidate([token.key for token in tokens])
+        # Both are process-local.
+        graph.clear()
+        throttling.get_store().clear()
+
+    def measure(self, client, make_request, tokens, counter, options):
+        samples, peaks = [], []
+        for i in range(options['warmup'] + options['requests']):
+            method, path = make_request()
+            headers = {'Authorization': f'Token {tokens[i % len(tokens)].key}'}
+            send = lambda: getattr(client, method)(path, headers=headers)
+            if i < options['warmup']:
+                send()
+            elif i % 10 == 0:
+                # Tracing slows the request down, so traced requests only count towards allocations.
+                tracemalloc.start()
+                send()
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            else:
+                start_queries, start = counter.count, time.perf_counter()
+                response = send()
+                samples.append((time.perf_counter() - start, counter.count - start_queries, response.status_code))
+            notifications.flush()
+        return self.summarize(samples, peaks)
+
+    async def measure_async(self, client, make_request, tokens, counter, options):
+        samples, peaks = [], []
+        for i in range(options['warmup'] + options['requests']):
+            method, path = make_request()
+            headers = {'Authorization': f'Token {tokens[i % len(tokens)].key}'}
+            send = lambda: getattr(client, method)(path, headers=headers)
+            if i < options['warmup']:
+                await send()
+            elif i % 10 == 0:
+                # tracemalloc traces every thread, including the one running the sync view.
+                tracemalloc.start()
+                await send()
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            else:
+                start_queries, start = counter.count, time.perf_counter()
+                response = await send()
+                samples.append((time.perf_counter() - start, counter.count - start_queries, response.status_code))
+            await sync_to_async(notifications.flush)()
+        return self.summarize(samples, peaks)
+
+    def summarize(self, samples, peaks=()):
+        latencies = [latency * 1000 for latency, _, _ in samples]
+        queries = [count for _, count, _ in samples]
+        statuses = {}
+        for _, _, code in samples:
+            statuses[str(code)] = statuses.get(str(code), 0) + 1
+        return {
+            'requests': len(samples),
+            'status_codes': statuses,
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'mean_ms': round(statistics.fmean(latencies), 3),
+            'queries_per_request': round(statistics.fmean(queries), 2),
+            'max_queries': max(queries),
+            'alloc_peak_kib_p50': round(statistics.median(peaks) / 1024, 1) if peaks else None,
+        }
+
+    def compare(self, report, path, max_regression):
+        with open(path) as f:
+            baseline = json.load(f)['results']
+        regressions = []
+        self.stderr.write(f'{"endpoint":<22}{"p95 ms":>12}{"baseline":>12}{"change":>10}{"queries":>10}{"baseline":>10}')
+        for name, result in sorted(report['results'].items()):
+            base = baseline.get(name)
+            if base is None:
+                continue
+            change = (result['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100 if base['p95_ms'] else 0.0
+            self.stderr.write(
+                f'{name:<22}{result["p95_ms"]:>12.2f}{base["p95_ms"]:>12.2f}{change:>9.1f}%'
+                f'{result["queries_per_request"]:>10}{base["queries_per_request"]:>10}'
+            )
+            if max_regression is not None and change > max_regression:
+                regressions.append(name)
+        if regressions:
+            raise CommandError(f'p95 regressed by more than {max_regression}% for: {", ".join(regressions)}')
@@ -0,0 +1,95 @@
+import json
+import timeit
+from io import BytesIO, StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from common import renderers
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the bytes/sec of the stock JSON renderer and parser with the fast ones '
+        'on the feed and post list responses.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--number', type=int, default=200, help='Renders per run.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per renderer; the fastest one counts.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--use-current-database', action='store_true',
+            help='Run against the configured database instead of seeding a throwaway test database.',
+        )
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stderr.write('orjson is not installed; the fast renderer falls back to the stock one.')
+        setup_test_environment()
+        test_db = None
+        if not options['use_current_database']:
+            test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            if test_db is not None:
+                call_command(
+                    'seed_social', users=200, posts=5000, comments=10000, likes=20000,
+                    seed=options['seed'], prefix='bench', stdout=StringIO(),
+                )
+            report = self.run(options)
+        finally:
+            if test_db is not None:
+                connection.creation.destroy_test_db(test_db, verbosity=0)
+            teardown_test_environment()
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def run(self, options):
+        # The reader with the fullest timeline.
+        user = User.objects.annotate(entries=Count('timeline_entries')).order_by('-entries', 'id').first()
+        if user is None:
+            raise CommandError('There is no data to render; seed some first.')
+        client = APIClient()
+        client.force_authenticate(user)
+        query = f'?page_size={options["page_size"]}'
+        results = {}
+        for name, url in (('feed', reverse('feed')), ('post_list', reverse('post-list'))):
+            data = client.get(url + query).data
+            content = JSONRenderer().render(data)
+            results[name] = {
+                'bytes': len(content),
+                'render': self.compare(
+                    lambda: JSONRenderer().render(data),
+                    lambda: renderers.FastJSONRenderer().render(data),
+                    len(content), options,
+                ),
+                'parse': self.compare(
+                    lambda: JSONParser().parse(BytesIO(content)),
+                    lambda: renderers.FastJSONParser().parse(BytesIO(content)),
+                    len(content), options,
+                ),
+            }
+        return results
+
+    def compare(self, stock, fast, size, options):
+        stock_time = self.measure(stock, options)
+        fast_time = self.measure(fast, options)
+        return {
+            'stock_bytes_per_sec': round(size / stock_time),
+            'fast_bytes_per_sec': round(size / fast_time),
+            'speedup': round(stock_time / fast_time, 2),
+        }
+
+    def measure(self, func, options):
+        """Seconds per call, from the fastest of ``--repeat`` runs."""
+        return min(timeit.repeat(func, number=options['number'], repeat=options['repeat'])) / options['number']
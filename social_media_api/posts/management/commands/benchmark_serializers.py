@@ -0,0 +1,104 @@
+import json
+import time
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from notifications.models import Notification
+from notifications.serializers import NotificationSerializer
+from posts.models import Comment, Post
+from posts.serializers import CommentSerializer, PostSerializer
+from common.compiled import get_compiled
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the throughput of the model serializers with their compiled forms '
+        'on the same rows, including the queries each one makes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows serialized per run.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per serializer; the fastest one counts.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--use-current-database', action='store_true',
+            help='Run against the configured database instead of seeding a throwaway test database.',
+        )
+
+    def handle(self, *args, **options):
+        test_db = None
+        if not options['use_current_database']:
+            test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            if test_db is not None:
+                rows = options['rows']
+                call_command(
+                    'seed_social', users=max(rows // 10, 10), posts=rows, comments=rows * 3, likes=rows * 5,
+                    seed=options['seed'], prefix='bench', stdout=StringIO(),
+                )
+            report = self.run(options)
+        finally:
+            if test_db is not None:
+                connection.creation.destroy_test_db(test_db, verbosity=0)
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def run(self, options):
+        user = User.objects.order_by('id').first()
+        if user is None:
+            raise CommandError('There is no data to serialize; seed some first.')
+        request = Request(RequestFactory().get('/'))
+        request.user = user
+        context = {'request': request}
+        rows = options['rows']
+        cases = {
+            'post': (
+                PostSerializer,
+                PostSerializer.annotate_for_user(Post.objects.order_by('-created_at', '-id'), user)[:rows],
+            ),
+            'comment': (CommentSerializer, Comment.objects.order_by('-created_at', '-id')[:rows]),
+            'notification': (NotificationSerializer, Notification.objects.order_by('-timestamp', '-id')[:rows]),
+        }
+        results = {}
+        for name, (serializer_class, queryset) in cases.items():
+            model = lambda: serializer_class(
+                serializer_class.setup_eager_loading(queryset), many=True, context=context
+            ).data
+            compiled = lambda: get_compiled(serializer_class).serialize(queryset, context)
+            if JSONRenderer().render(model()) != JSONRenderer().render(compiled()):
+                raise CommandError(f'The compiled {serializer_class.__name__} does not match the serializer.')
+            model_time = self.measure(model, options['repeat'])
+            compiled_time = self.measure(compiled, options['repeat'])
+            count = len(compiled())
+            results[name] = {
+                'rows': count,
+                'model_queries': self.count_queries(model),
+                'compiled_queries': self.count_queries(compiled),
+                'model_rows_per_sec': round(count / model_time),
+                'compiled_rows_per_sec': round(count / compiled_time),
+                'speedup': round(model_time / compiled_time, 2),
+            }
+        return results
+
+    def count_queries(self, serialize):
+        with CaptureQueriesContext(connection) as queries:
+            serialize()
+        return len(queries)
+
+    def measure(self, serialize, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            serialize()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
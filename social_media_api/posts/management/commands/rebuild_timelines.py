@@ -0,0 +1,39 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from posts import timeline
+from posts.models import Post, TimelineEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized home timelines from the current follow graph.'
+
+    def handle(self, *args, **options):
+        TimelineEntry.objects.all().delete()
+        # Each author's most recent posts are read once, in one windowed query, and
+        # then copied to every follower, instead of querying them again per follow.
+        recent = (
+            Post.objects.exclude(author_id__in=timeline.get_celebrity_ids())
+            .annotate(rank=Window(RowNumber(), partition_by=F('author_id'), order_by=(F('created_at').desc(), F('id').desc())))
+            .filter(rank__lte=timeline.BACKFILL_LIMIT)
+            .values_list('author_id', 'id', 'created_at')
+        )
+        posts_by_author = defaultdict(list)
+        for author_id, post_id, created_at in recent.iterator(chunk_size=timeline.BATCH_SIZE):
+            posts_by_author[author_id].append((post_id, created_at))
+
+        follows = timeline.Follow.objects.values_list('from_customuser', 'to_customuser')
+        count = 0
+
+        def entries():
+            nonlocal count
+            for follower_id, author_id in follows.iterator(chunk_size=timeline.BATCH_SIZE):
+                count += 1
+                for post_id, created_at in posts_by_author.get(author_id, ()):
+                    yield TimelineEntry(user_id=follower_id, post_id=post_id, author_id=author_id, created_at=created_at)
+
+        timeline.bulk_insert(entries())
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt timelines for {count} follow relationships.'))
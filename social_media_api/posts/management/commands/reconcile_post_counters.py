@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from posts.models import Comment, Like, Post
+
+
+def count(model):
+    rows = model.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(total=Count('id'))
+    return Coalesce(Subquery(rows.values('total')), Value(0))
+
+
+class Command(BaseCommand):
+    help = 'Recompute Post.like_count and Post.comment_count and fix any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        checked = fixed = 0
+        last_id = 0
+        while True:
+            ids = list(Post.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            # The counts are computed by the UPDATE itself, as in migration 0005, so
+            # likes and comments made while the command runs are not overwritten by
+            # counts read earlier.
+            fixed += (
+                Post.objects.filter(id__gt=last_id, id__lte=ids[-1])
+                .filter(~Q(like_count=count(Like)) | ~Q(comment_count=count(Comment)))
+                .update(like_count=count(Like), comment_count=count(Comment))
+            )
+            last_id = ids[-1]
+            checked += len(ids)
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} posts, fixed {fixed}.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import ranking
+
+
+class Command(BaseCommand):
+    help = 'Score new posts and rescore posts whose likes or comments changed. Run periodically.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=ranking.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        created, updated = ranking.refresh_scores(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Scored {created} new posts, rescored {updated}.'))
@@ -0,0 +1,259 @@
+import random
+import time
+from array import array
+from datetime import timedelta
+from io import StringIO
+from itertools import islice
+from math import gcd
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from notifications.models import Notification
+from posts.models import Comment, Like, Post
+
+User = get_user_model()
+Follow = User.following.through
+
+WORDS = (
+    'django python api feed post comment like follow timeline cache query index search rank '
+    'coffee garden travel music photo weekend city river mountain book movie recipe basil tomato '
+    'running cycling football chess coding release deploy bug fix review design data model'
+).split()
+
+
+def power_law_rank(rng, n, exponent):
+    """A rank in ``[0, n)`` drawn with probability roughly proportional to ``(rank + 1) ** -exponent``."""
+    # Inverse CDF of a continuous power law on [1, n + 1); O(1) time and memory per draw.
+    if exponent == 1:
+        value = (n + 1) ** rng.random()
+    else:
+        one_minus = 1 - exponent
+        value = ((pow(n + 1, one_minus) - 1) * rng.random() + 1) ** (1 / one_minus)
+    return min(int(value) - 1, n - 1)
+
+
+class Scrambler:
+    """Spreads popularity ranks over ``ids`` so the most popular rows aren't simply the first ones."""
+
+    def __init__(self, ids):
+        self.ids = ids
+        self.step = max(1, int(len(ids) * 0.618))
+        while len(ids) > 1 and gcd(self.step, len(ids)) != 1:
+            self.step += 1
+
+    def __call__(self, rank):
+        return self.ids[rank * self.step % len(self.ids)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic social graph: users with power-law follower counts, posts, comments, '
+        'likes and notifications, inserted in batches. The same --seed always yields the same data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--follows-per-user', type=int, default=20, help='Mean number of accounts each user follows.')
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--likes', type=int, default=50000)
+        parser.add_argument(
+            '--notification-ratio', type=float, default=0.2,
+            help='Fraction of follows, comments and likes that also get a notification.',
+        )
+        parser.add_argument('--exponent', type=float, default=1.0, help='Power-law (Zipf) exponent for popularity.')
+        parser.add_argument('--days', type=int, default=30, help='Spread posts over this many days.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='seed', help='Username prefix; must not be in use yet.')
+        parser.add_argument('--skip-rebuild', action='store_true', help='Do not rebuild derived data afterwards.')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(f'Users named "{options["prefix"]}..." already exist; pick another --prefix.')
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=options['days'])
+        self.user_type = ContentType.objects.get_for_model(User).pk
+        self.post_type = ContentType.objects.get_for_model(Post).pk
+        self.counts = dict.fromkeys(('follows', 'comments', 'likes', 'notifications'), 0)
+
+        started = time.perf_counter()
+        self.user_ids = self.insert_returning_ids(User, self.generate_users())
+        self.popular_user = Scrambler(self.user_ids)
+        # The most active accounts are not the most followed ones; otherwise every
+        # popular follow would backfill a full page of posts into the timelines.
+        self.active_user = Scrambler(self.user_ids[::-1])
+        self.insert(Follow, self.generate_follows(), 'follows')
+        # Post authors are kept in a compact array so notifications can name the recipient.
+        self.post_authors = array('q')
+        self.post_ids = self.insert_returning_ids(Post, self.generate_posts())
+        self.popular_post = Scrambler(range(len(self.post_ids)))
+        self.insert(Comment, self.generate_comments(), 'comments')
+        self.insert(Like, self.generate_likes(), 'likes')
+        self.stdout.write(
+            f'Inserted {len(self.user_ids)} users, {self.counts["follows"]} follows, {len(self.post_ids)} posts, '
+            f'{self.counts["comments"]} comments, {self.counts["likes"]} likes and '
+            f'{self.counts["notifications"]} notifications in {time.perf_counter() - started:.1f}s.'
+        )
+
+        if not options['skip_rebuild']:
+            for command in ('reconcile_post_counters', 'rebuild_timelines', 'rebuild_search_index', 'refresh_post_scores'):
+                started = time.perf_counter()
+                call_command(command, stdout=StringIO())
+                self.stdout.write(f'Ran {command} in {time.perf_counter() - started:.1f}s.')
+        self.stdout.write(self.style.SUCCESS('Done.'))
+
+    def batches(self, objects):
+        while True:
+            batch = list(islice(objects, self.options['batch_size']))
+            if not batch:
+                return
+            yield batch
+
+    def insert_returning_ids(self, model, objects):
+        ids = array('q')
+        with transaction.atomic():
+            for batch in self.batches(objects):
+                ids.extend(obj.pk for obj in self.bulk_create(model, batch))
+        return ids
+
+    def insert(self, model, events, name, **kwargs):
+        """
+        Insert a stream of ``(row, notification or None)`` pairs one batch at a time,
+        so memory use is bounded by the batch size rather than the row count.
+        """
+        with transaction.atomic():
+            for batch in self.batches(events):
+                self.bulk_create(model, [row for row, _ in batch], **kwargs)
+                notifications = [notification for _, notification in batch if notification is not None]
+                self.bulk_create(Notification, notifications)
+                self.counts[name] += len(batch)
+                self.counts['notifications'] += len(notifications)
+
+    def bulk_create(self, model, objects, **kwargs):
+        """
+        ``bulk_create`` that keeps the generated timestamps. ``auto_now`` and
+        ``auto_now_add`` fields are stamped with "now" on insert, so their values
+        are written back by primary key afterwards.
+        """
+        fields = [
+            field for field in model._meta.concrete_fields
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+        ]
+        timestamps = [[getattr(obj, field.attname) for field in fields] for obj in objects]
+        created = model.objects.bulk_create(objects, **kwargs)
+        if fields and created:
+            # One prepared statement per batch; bulk_update's CASE expressions
+            # cost more to build than the inserts themselves.
+            quote = connection.ops.quote_name
+            assignments = ', '.join(f'{quote(field.column)} = %s' for field in fields)
+            sql = f'UPDATE {quote(model._meta.db_table)} SET {assignments} WHERE {quote(model._meta.pk.column)} = %s'
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, [
+                    [field.get_db_prep_value(value, connection) for field, value in zip(fields, values)] + [obj.pk]
+                    for obj, values in zip(created, timestamps)
+                ])
+        return created
+
+    def text(self, low, high):
+        return ' '.join(self.rng.choices(WORDS, k=self.rng.randint(low, high)))
+
+    def random_followee(self):
+        return self.popular_user(power_law_rank(self.rng, len(self.user_ids), self.options['exponent']))
+
+    def random_actor(self):
+        """A user writing a post, comment or like; activity is skewed too, but towards other users."""
+        return self.active_user(power_law_rank(self.rng, len(self.user_ids), self.options['exponent']))
+
+    def random_post(self):
+        """Index of a post; popular posts are picked more often."""
+        return self.popular_post(power_law_rank(self.rng, len(self.post_ids), self.options['exponent']))
+
+    def post_time(self, index):
+        # Posts are spread evenly over the window in insertion order, so a post's
+        # timestamp can be recomputed from its index instead of being stored.
+        return self.start + (self.now - self.start) * index / max(self.options['posts'], 1)
+
+    def notification(self, recipient, actor, verb, content_type, object_id, timestamp):
+        if recipient == actor or self.rng.random() >= self.options['notification_ratio']:
+            return None
+        return Notification(
+            recipient_id=recipient, actor_id=actor, verb=verb, timestamp=timestamp,
+            target_content_type_id=content_type, target_object_id=object_id,
+        )
+
+    def generate_users(self):
+        for i in range(self.options['users']):
+            yield User(username=f'{self.options["prefix"]}{i}', password='!', date_joined=self.start)
+
+    def generate_follows(self):
+        mean = self.options['follows_per_user']
+        for follower in self.user_ids:
+            # Pareto(2) has a mean of 2, so halving it keeps the requested mean with a long tail.
+            count = min(int(mean * self.rng.paretovariate(2) / 2), len(self.user_ids) - 1)
+            followees = dict.fromkeys(self.random_followee() for _ in range(count))
+            followees.pop(follower, None)
+            for followee in followees:
+                timestamp = self.start + (self.now - self.start) * self.rng.random()
+                yield (
+                    Follow(from_customuser_id=follower, to_customuser_id=followee),
+                    self.notification(followee, follower, 'started following you', self.user_type, follower, timestamp),
+                )
+
+    def generate_posts(self):
+        for i in range(self.options['posts']):
+            author = self.random_actor()
+            self.post_authors.append(author)
+            created_at = self.post_time(i)
+            yield Post(
+                author_id=author, title=self.text(2, 6).capitalize(), content=self.text(8, 40),
+                created_at=created_at, updated_at=created_at,
+            )
+
+    def generate_comments(self):
+        for _ in range(self.options['comments']):
+            index, author = self.random_post(), self.random_actor()
+            post_time = self.post_time(index)
+            created_at = post_time + (self.now - post_time) * self.rng.random()
+            yield (
+                Comment(
+                    post_id=self.post_ids[index], author_id=author, content=self.text(3, 20),
+                    created_at=created_at, updated_at=created_at,
+                ),
+                self.notification(
+                    self.post_authors[index], author, 'commented on your post',
+                    self.post_type, self.post_ids[index], created_at,
+                ),
+            )
+
+    def generate_likes(self):
+        # Likes are drawn per post, so only one post's likers are held at a time.
+        # A post can't have more likes than there are users.
+        users = len(self.user_ids)
+        like_counts = array('q', [0]) * len(self.post_ids)
+        for _ in range(self.options['likes']):
+            like_counts[self.random_post()] += 1
+        for index, count in enumerate(like_counts):
+            likers = {}
+            for _ in range(min(count, users)):
+                rank = power_law_rank(self.rng, users, self.options['exponent'])
+                # A repeated liker gives way to the next, less active, user.
+                while self.active_user(rank) in likers:
+                    rank = (rank + 1) % users
+                likers[self.active_user(rank)] = None
+            post_time = self.post_time(index)
+            for user in likers:
+                yield (
+                    Like(post_id=self.post_ids[index], user_id=user),
+                    self.notification(
+                        self.post_authors[index], user, 'liked your post', self.post_type, self.post_ids[index],
+                        post_time + (self.now - post_time) * self.rng.random(),
+                    ),
+                )
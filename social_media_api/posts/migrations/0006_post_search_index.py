@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# The index as it was defined when this migration was written; posts.search
+# must keep querying the same table and expression.
+FORWARD_SQL = {
+    'sqlite': [
+        'CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING fts5(title, content)',
+        'INSERT INTO posts_post_fts (rowid, title, content) SELECT id, title, content FROM posts_post',
+    ],
+    'postgresql': [
+        "CREATE INDEX post_search_idx ON posts_post USING gin "
+        "(to_tsvector('english'::regconfig, COALESCE(title, '') || ' ' || COALESCE(content, '')))",
+    ],
+}
+REVERSE_SQL = {
+    'sqlite': ['DROP TABLE IF EXISTS posts_post_fts'],
+    'postgresql': ['DROP INDEX IF EXISTS post_search_idx'],
+}
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_post_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(FORWARD_SQL), run(REVERSE_SQL)),
+    ]
@@ -0,0 +1,143 @@
+"""
+Engagement ranking for the ``?mode=ranked`` feed.
+
+A post's score is ``log2(1 + engagement) + created_at / half_life``, where
+engagement weighs likes and comments. Comparing two scores is the same as
+comparing engagement decayed by half every ``HALF_LIFE_HOURS``, but a score
+only changes when the post's counters do, not as time passes. Scores are kept
+in ``PostScore`` and refreshed in batches by ``refresh_post_scores``, which
+only touches rows whose counters moved since the last run. Reading a ranked
+feed is then an ordered scan over precomputed rows.
+"""
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from accounts import graph
+from . import timeline
+from .models import Post, PostScore, TimelineEntry
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+RANKING_SETTINGS = getattr(settings, 'FEED_RANKING', {})
+LIKE_WEIGHT = RANKING_SETTINGS.get('LIKE_WEIGHT', 1.0)
+COMMENT_WEIGHT = RANKING_SETTINGS.get('COMMENT_WEIGHT', 2.0)
+HALF_LIFE = RANKING_SETTINGS.get('HALF_LIFE_HOURS', 6) * 3600
+CANDIDATE_WINDOW_HOURS = RANKING_SETTINGS.get('CANDIDATE_WINDOW_HOURS', 72)
+BATCH_SIZE = 1000
+
+
+def score_batch(like_counts, comment_counts, created_ats):
+    """Score a batch of posts given parallel sequences of counters and creation times."""
+    timestamps = [created_at.timestamp() for created_at in created_ats]
+    if numpy is not None:
+        engagement = (
+            LIKE_WEIGHT * numpy.asarray(like_counts, dtype=float)
+            + COMMENT_WEIGHT * numpy.asarray(comment_counts, dtype=float)
+        )
+        return (numpy.log2(1 + engagement) + numpy.asarray(timestamps) / HALF_LIFE).tolist()
+    return [
+        math.log2(1 + LIKE_WEIGHT * likes + COMMENT_WEIGHT * comments) + timestamp / HALF_LIFE
+        for likes, comments, timestamp in zip(like_counts, comment_counts, timestamps)
+    ]
+
+
+def create_score(post):
+    [score] = score_batch([post.like_count], [post.comment_count], [post.created_at])
+    return PostScore.objects.create(
+        post=post,
+        author_id=post.author_id,
+        created_at=post.created_at,
+        like_count=post.like_count,
+        comment_count=post.comment_count,
+        score=score,
+    )
+
+
+def _score_rows(rows):
+    post_ids, author_ids, created_ats, like_counts, comment_counts = zip(*rows)
+    scores = score_batch(like_counts, comment_counts, created_ats)
+    return [
+        PostScore(
+            post_id=post_id, author_id=author_id, created_at=created_at,
+            like_count=likes, comment_count=comments, score=score,
+        )
+        for post_id, author_id, created_at, likes, comments, score
+        in zip(post_ids, author_ids, created_ats, like_counts, comment_counts, scores)
+    ]
+
+
+def refresh_scores(batch_size=None):
+    """
+    Score posts that have no ``PostScore`` yet and rescore those whose like or
+    comment counter changed since they were last scored. Returns
+    ``(created, updated)``.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    fields = ('id', 'author_id', 'created_at', 'like_count', 'comment_count')
+    created = updated = 0
+
+    unscored = Post.objects.filter(ranking__isnull=True).order_by('id').values_list(*fields)
+    last_id = 0
+    while True:
+        rows = list(unscored.filter(id__gt=last_id)[:batch_size])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        PostScore.objects.bulk_create(_score_rows(rows), ignore_conflicts=True)
+        created += len(rows)
+
+    changed = (
+        PostScore.objects.exclude(like_count=F('post__like_count'), comment_count=F('post__comment_count'))
+        .order_by('post_id')
+        .values_list('post_id', 'author_id', 'created_at', 'post__like_count', 'post__comment_count')
+    )
+    last_id = 0
+    while True:
+        rows = list(changed.filter(post_id__gt=last_id)[:batch_size])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        PostScore.objects.bulk_update(_score_rows(rows), ['like_count', 'comment_count', 'score'])
+        updated += len(rows)
+    return created, updated
+
+
+def get_feed_keys(user, limit, before=None):
+    """
+    Return up to ``limit`` ``(score, post_id)`` pairs for ``user``'s ranked feed,
+    best first, strictly below the ``before`` pair when given. Candidates are the
+    posts of the last ``CANDIDATE_WINDOW_HOURS`` that have been scored.
+    """
+    since = timezone.now() - timedelta(hours=CANDIDATE_WINDOW_HOURS)
+    entries = TimelineEntry.objects.filter(user=user, created_at__gte=since, post__ranking__isnull=False)
+    if before is not None:
+        entries = entries.filter(timeline.keyset_before(before, 'post__ranking__score', 'post_id'))
+    sources = [
+        entries.order_by('-post__ranking__score', '-post_id').values_list('post__ranking__score', 'post_id')[:limit]
+    ]
+
+    celebrity_ids = timeline.get_celebrity_ids()
+    if celebrity_ids:
+        followed = graph.get_following_ids(user.pk) & celebrity_ids
+        if followed:
+            scores = PostScore.objects.filter(author_id__in=followed, created_at__gte=since)
+            if before is not None:
+                scores = scores.filter(timeline.keyset_before(before, 'score', 'post_id'))
+            sources.append(scores.order_by('-score', '-post_id').values_list('score', 'post_id')[:limit])
+    return timeline.merge_keys(sources, limit)
+
+
+def get_feed_queryset(user):
+    """All of ``user``'s ranked feed, best first."""
+    since = timezone.now() - timedelta(hours=CANDIDATE_WINDOW_HOURS)
+    return (
+        Post.objects.filter(timeline.feed_filter(user), ranking__isnull=False, created_at__gte=since)
+        .order_by('-ranking__score', '-id')
+    )
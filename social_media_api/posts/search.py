@@ -0,0 +1,118 @@
+"""
+Full-text search over post titles and content.
+
+The backend is picked from ``POSTS_SEARCH_BACKEND`` or, by default, from the
+database vendor: an FTS5 virtual table ranked with BM25 on SQLite, and a GIN
+indexed ``tsvector`` expression ranked with ``ts_rank`` on PostgreSQL. Other
+databases fall back to ``icontains``. Every backend annotates matches with a
+``search_rank`` where higher is better.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+
+class SQLiteFTSBackend:
+    table = 'posts_post_fts'
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, title, content) VALUES (%s, %s, %s)',
+                [post.pk, post.title, post.content],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [post_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(f'INSERT INTO {self.table} (rowid, title, content) SELECT id, title, content FROM posts_post')
+
+    def to_match(self, query):
+        # Quote every term so user input can never be parsed as FTS5 syntax.
+        return ' '.join('"%s"' % term.replace('"', '""') for term in query.split())
+
+    def search(self, queryset, query):
+        match = self.to_match(query)
+        rank = RawSQL(
+            f'SELECT -bm25({self.table}) FROM {self.table} WHERE {self.table} MATCH %s AND rowid = posts_post.id',
+            [match],
+            output_field=FloatField(),
+        )
+        matches = RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [match])
+        return queryset.filter(id__in=matches).annotate(search_rank=rank)
+
+
+class PostgresSearchBackend:
+    config = 'english'
+    index_name = 'post_search_idx'
+
+    def vector(self):
+        from django.contrib.postgres.search import SearchVector
+        return SearchVector('title', 'content', config=self.config)
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'REINDEX INDEX {self.index_name}')
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        search_query = SearchQuery(query, config=self.config, search_type='websearch')
+        return queryset.annotate(search_vector=self.vector()).filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(self.vector(), search_query)
+        )
+
+
+class SimpleSearchBackend:
+    """``icontains`` fallback for databases without a full-text index."""
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, queryset, query):
+        condition = Q()
+        for term in query.split():
+            condition &= Q(title__icontains=term) | Q(content__icontains=term)
+        return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+VENDOR_BACKENDS = {
+    'sqlite': 'posts.search.SQLiteFTSBackend',
+    'postgresql': 'posts.search.PostgresSearchBackend',
+}
+
+
+def get_backend(vendor=None):
+    path = getattr(settings, 'POSTS_SEARCH_BACKEND', None)
+    if path is None:
+        path = VENDOR_BACKENDS.get(vendor or connection.vendor, 'posts.search.SimpleSearchBackend')
+    return import_string(path)()
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """Drop-in replacement for ``SearchFilter`` that queries the full-text index."""
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return get_backend().search(queryset, query)
@@ -1,9 +1,17 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import BooleanField, Exists, F, OuterRef, Prefetch, Value, Window
+from django.db.models.functions import RowNumber
 from rest_framework import serializers
-from .models import Post, Comment
+from .models import Post, Comment, Like
 from django.contrib.auth import get_user_model
+from common.compiled import get_compiled
 
 User = get_user_model()
 
+COMMENTS_PREVIEW_LIMIT = getattr(settings, 'POST_COMMENTS_PREVIEW_LIMIT', 10)
+
 class CommentSerializer(serializers.ModelSerializer):
     author = serializers.ReadOnlyField(source='author.username')
 
@@ -11,10 +19,75 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ('id', 'post', 'author', 'content', 'created_at', 'updated_at')
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('author')
+
+    def validate_post(self, value):
+        # Posts count their comments; moving one would leave both counts wrong.
+        if self.instance is not None and value.pk != self.instance.post_id:
+            raise serializers.ValidationError('A comment cannot be moved to another post.')
+        return value
+
 class PostSerializer(serializers.ModelSerializer):
     author = serializers.ReadOnlyField(source='author.username')
-    comments = CommentSerializer(many=True, read_only=True)
+    liked_by_me = serializers.SerializerMethodField()
+    comments = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
-        fields = ('id', 'author', 'title', 'content', 'created_at', 'updated_at', 'comments')
+        fields = (
+            'id', 'author', 'title', 'content', 'created_at', 'updated_at',
+            'like_count', 'comment_count', 'liked_by_me', 'comments',
+        )
+        read_only_fields = ('like_count', 'comment_count')
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # Only the most recent comments of each post are embedded.
+        recent_comments = CommentSerializer.setup_eager_loading(
+            Comment.objects.order_by('-created_at', '-id')
+        )[:COMMENTS_PREVIEW_LIMIT]
+        return queryset.select_related('author').prefetch_related(
+            Prefetch('comments', queryset=recent_comments, to_attr='recent_comments')
+        )
+
+    @staticmethod
+    def annotate_for_user(queryset, user):
+        if not user.is_authenticated:
+            return queryset.annotate(liked_by_me=Value(False, output_field=BooleanField()))
+        return queryset.annotate(liked_by_me=Exists(Like.objects.filter(post=OuterRef('pk'), user=user.pk)))
+
+    def get_liked_by_me(self, obj):
+        liked = getattr(obj, 'liked_by_me', None)
+        if liked is None:
+            request = self.context.get('request')
+            user = getattr(request, 'user', None)
+            liked = bool(user and user.is_authenticated and Like.objects.filter(post=obj, user=user.pk).exists())
+        return liked
+
+    @staticmethod
+    def load_comments(rows, context):
+        # Compiled counterpart of the recent_comments prefetch: one windowed query per batch.
+        comments = defaultdict(list)
+        if rows:
+            recent = (
+                Comment.objects.filter(post_id__in=[row['id'] for row in rows])
+                .annotate(position=Window(
+                    RowNumber(), partition_by=F('post_id'), order_by=(F('created_at').desc(), F('id').desc())
+                ))
+                .filter(position__lte=COMMENTS_PREVIEW_LIMIT)
+                .order_by('-created_at', '-id')
+            )
+            for comment in get_compiled(CommentSerializer).serialize(recent, context):
+                comments[comment['post']].append(comment)
+        for row in rows:
+            row['comments'] = comments[row['id']]
+
+    def get_comments(self, obj):
+        comments = getattr(obj, 'recent_comments', None)
+        if comments is None:
+            comments = CommentSerializer.setup_eager_loading(
+                obj.comments.order_by('-created_at', '-id')
+            )[:COMMENTS_PREVIEW_LIMIT]
+        return CommentSerializer(comments, many=True, context=self.context).data
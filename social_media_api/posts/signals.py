@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import feed_cache, search, timeline
+from .models import Post
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.get_backend().index(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.get_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_feeds_on_edit(sender, instance, created, **kwargs):
+    # New posts are invalidated by timeline.fan_out_post once their timeline rows exist.
+    if not created:
+        feed_cache.invalidate_author(instance.author_id, timeline.get_celebrity_ids())
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_feeds_on_delete(sender, instance, **kwargs):
+    feed_cache.invalidate_author(instance.author_id, timeline.get_celebrity_ids())
+
+
+@receiver(m2m_changed, sender=User.following.through)
+def invalidate_feeds_on_follow(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse and pk_set:
+        feed_cache.invalidate(pk_set)
+    elif not reverse:
+        feed_cache.invalidate([instance.pk])
@@ -1,3 +1,1051 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers, status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from accounts import graph
+from common import instrumentation, profiling, renderers
+from common.compiled import CompiledSerializer, get_compiled
+from notifications.models import Notification
+from social_media_api import throttling
+from social_media_api.pagination import KeysetPagination
+from . import feed_cache, likes, ranking, timeline
+from .models import Comment, Like, Post, PostScore, TimelineEntry
+from .serializers import COMMENTS_PREVIEW_LIMIT, CommentSerializer, PostSerializer
+from .views import FeedView
+
+User = get_user_model()
+
+
+class LikeToggleTests(APITestCase):
+    def setUp(self):
+        throttling.get_store().clear()
+        self.author = User.objects.create_user(username='author', password='password')
+        self.user = User.objects.create_user(username='user', password='password')
+        self.post = Post.objects.create(author=self.author, title='Post', content='content')
+        self.client.force_authenticate(self.user)
+
+    def toggle(self, name, pk=None):
+        return self.client.post(reverse(name, args=[pk or self.post.pk]))
+
+    def test_like_and_unlike_are_idempotent(self):
+        first, second = self.toggle('like_post'), self.toggle('like_post')
+        self.assertEqual((first.status_code, first.data), (201, {'liked': True, 'like_count': 1}))
+        self.assertEqual((second.status_code, second.data), (200, {'liked': True, 'like_count': 1}))
+        for _ in range(2):
+            response = self.toggle('unlike_post')
+            self.assertEqual((response.status_code, response.data), (200, {'liked': False, 'like_count': 0}))
+        self.assertFalse(Like.objects.exists())
+
+    def test_missing_post(self):
+        self.assertEqual(self.toggle('like_post', 999999).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.toggle('unlike_post', 999999).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Like.objects.exists())
+
+
+class LikedByMeTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        graph.clear()
+        self.reader = User.objects.create_user(username='reader', password='password')
+        self.author = User.objects.create_user(username='author', password='password')
+        self.reader.following.add(self.author)
+        self.posts = [Post.objects.create(author=self.author, title=str(i), content='content') for i in range(12)]
+        for post in self.posts:
+            timeline.fan_out_post(post)
+        Like.objects.bulk_create(Like(user=self.reader, post=post) for post in self.posts[::2])
+        Like.objects.create(user=self.author, post=self.posts[1])
+        self.client.force_authenticate(self.reader)
+
+    def liked(self, response):
+        return {int(post['title']): post['liked_by_me'] for post in response.data['results']}
+
+    def expected(self, titles):
+        return {title: title % 2 == 0 for title in titles}
+
+    def test_post_list_and_detail(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('post-list'))
+        liked = self.liked(response)
+        self.assertEqual(liked, self.expected(liked))
+        self.assertTrue(self.client.get(reverse('post-detail', args=[self.posts[0].pk])).data['liked_by_me'])
+
+    def test_feed(self):
+        timeline.get_celebrity_ids()
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('feed'))
+        liked = self.liked(response)
+        self.assertEqual(liked, self.expected(liked))
+
+    def test_anonymous(self):
+        self.client.force_authenticate(None)
+        self.assertFalse(any(self.liked(self.client.get(reverse('post-list'))).values()))
+
+
+class ConcurrentLikeTests(TransactionTestCase):
+    """Parallel likes of one post by one user must produce a single like."""
+    workers = 8
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='password')
+        self.user = User.objects.create_user(username='user', password='password')
+        self.post = Post.objects.create(author=self.author, title='Post', content='content')
+
+    def run_in_parallel(self, func):
+        barrier = threading.Barrier(self.workers)
+        results, errors = [], []
+
+        def worker():
+            barrier.wait()
+            try:
+                results.append(func(self.user.pk, self.post.pk))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def assert_consistent(self, results, errors, liked):
+        # SQLite serializes writers and may turn a contended write away as "locked";
+        # whatever succeeds must still leave exactly one outcome.
+        self.assertTrue(results)
+        for error in errors:
+            self.assertIsInstance(error, OperationalError)
+        self.assertEqual(sum(changed for changed, _, _ in results), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(Like.objects.filter(post=self.post).count(), int(liked))
+        self.assertEqual(self.post.like_count, int(liked))
+
+    def test_parallel_likes_then_unlikes(self):
+        self.assert_consistent(*self.run_in_parallel(likes.like), liked=True)
+        self.assert_consistent(*self.run_in_parallel(likes.unlike), liked=False)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'requires PostgreSQL')
+class PostgresConcurrentLikeTests(ConcurrentLikeTests):
+    """On PostgreSQL contended writes wait on row locks, so every call must succeed."""
+    workers = 32
+
+    def assert_consistent(self, results, errors, liked):
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), self.workers)
+        super().assert_consistent(results, errors, liked)
+
+
+class FeedTestCase(APITestCase):
+    """A ``reader`` following nobody yet and an ``author``, with empty caches."""
+
+    def setUp(self):
+        cache.clear()
+        graph.clear()
+        self.reader = User.objects.create_user(username='reader', password='password')
+        self.author = User.objects.create_user(username='author', password='password')
+        self.client.force_authenticate(self.reader)
+
+    def create_post(self, author, title):
+        self.client.force_authenticate(author)
+        response = self.client.post(reverse('post-list'), {'title': title, 'content': 'content'})
+        self.client.force_authenticate(self.reader)
+        return Post.objects.get(pk=response.data['id'])
+
+    def feed_titles(self):
+        response = self.client.get(reverse('feed'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['title'] for post in response.data['results']]
+
+
+class TimelineTests(FeedTestCase):
+
+    def test_post_is_fanned_out_to_followers(self):
+        self.reader.following.add(self.author)
+        post = self.create_post(self.author, 'Hello')
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, post=post).exists())
+        self.assertEqual(self.feed_titles(), ['Hello'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        self.create_post(self.author, 'Before follow')
+        self.client.post(reverse('follow_user', args=[self.author.pk]))
+        self.assertEqual(self.feed_titles(), ['Before follow'])
+        self.client.post(reverse('unfollow_user', args=[self.author.pk]))
+        self.assertEqual(self.feed_titles(), [])
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader).exists())
+
+    def test_celebrity_posts_are_merged_at_read_time(self):
+        other = User.objects.create_user(username='other', password='password')
+        fan = User.objects.create_user(username='fan', password='password')
+        self.reader.following.add(self.author, other)
+        fan.following.add(self.author)
+        with mock.patch.object(timeline, 'FANOUT_FOLLOWER_THRESHOLD', 2):
+            self.create_post(other, 'Regular 1')
+            self.create_post(self.author, 'Celebrity')
+            self.create_post(other, 'Regular 2')
+            self.assertFalse(TimelineEntry.objects.filter(author=self.author).exists())
+            self.assertEqual(self.feed_titles(), ['Regular 2', 'Celebrity', 'Regular 1'])
+
+    def test_demoted_celebrity_posts_stay_in_the_feed(self):
+        fan = User.objects.create_user(username='fan', password='password')
+        self.reader.following.add(self.author)
+        fan.following.add(self.author)
+        with mock.patch.object(timeline, 'FANOUT_FOLLOWER_THRESHOLD', 2):
+            self.create_post(self.author, 'Celebrity')
+            self.assertFalse(TimelineEntry.objects.filter(author=self.author).exists())
+            self.client.force_authenticate(fan)
+            with mock.patch.object(timeline, '_executor') as executor:
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.post(reverse('unfollow_user', args=[self.author.pk]))
+            # The unfollow only queues the fan-out; until it runs the cached
+            # celebrity set keeps merging the author's posts.
+            self.assertFalse(TimelineEntry.objects.filter(author=self.author).exists())
+            executor.submit.assert_called_once_with(timeline._restore_demoted_in_worker, {self.author.pk})
+            self.client.force_authenticate(self.reader)
+            self.assertEqual(self.feed_titles(), ['Celebrity'])
+            timeline.restore_demoted({self.author.pk})
+            self.assertEqual(timeline.get_celebrity_ids(), set())
+            self.assertEqual(self.feed_titles(), ['Celebrity'])
+
+    def test_unfollow_does_not_count_followers(self):
+        self.reader.following.add(self.author)
+        timeline.get_celebrity_ids()
+        graph.get_following_ids(self.reader.pk)
+        with mock.patch.object(timeline, 'restore_demoted') as restore_demoted:
+            self.client.post(reverse('unfollow_user', args=[self.author.pk]))
+        restore_demoted.assert_not_called()
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        graph.clear()
+        self.user = User.objects.create_user(username='user', password='password')
+        self.client.force_authenticate(self.user)
+        Post.objects.bulk_create(Post(author=self.user, title=f'Post {i}', content='content') for i in range(25))
+
+    def collect(self, url):
+        titles = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            titles.extend(post['title'] for post in response.data['results'])
+            url = response.data['next']
+        return titles
+
+    def test_post_list_walks_every_page_once(self):
+        titles = self.collect(reverse('post-list'))
+        self.assertEqual(titles, [f'Post {i}' for i in reversed(range(25))])
+
+    def test_feed_walks_every_page_once(self):
+        follower = User.objects.create_user(username='follower', password='password')
+        self.client.force_authenticate(follower)
+        self.client.post(reverse('follow_user', args=[self.user.pk]))
+        titles = self.collect(reverse('feed') + '?page_size=7')
+        self.assertEqual(titles, [f'Post {i}' for i in reversed(range(25))])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('post-list') + '?cursor=garbage')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_malformed_cursor_values(self):
+        follower = User.objects.create_user(username='follower', password='password')
+        self.client.force_authenticate(follower)
+        paginator = KeysetPagination()
+        urls = [reverse('post-list'), reverse('comment-list'), reverse('feed'), reverse('notifications')]
+        for position in (['notadate', 1], ['2024-01-01T00:00:00', 'x'], [None, None], [{}, []]):
+            cursor = paginator.encode_cursor(position)
+            for url in urls:
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, (url, position))
+
+
+class QueryBudgetTests(APITestCase):
+    """
+    Query counts per endpoint must not grow with the number of rows returned.
+    Each budget includes the conditional GET validator query.
+    """
+
+    def setUp(self):
+        cache.clear()
+        graph.clear()
+        self.reader = User.objects.create_user(username='reader', password='password')
+        authors = [User.objects.create_user(username=f'author{i}', password='password') for i in range(3)]
+        self.reader.following.add(*authors)
+        for author in authors:
+            for i in range(4):
+                post = Post.objects.create(author=author, title=f'{author} {i}', content='content')
+                timeline.fan_out_post(post)
+                Comment.objects.bulk_create(
+                    Comment(post=post, author=commenter, content='comment') for commenter in authors
+                )
+        self.client.force_authenticate(self.reader)
+
+    def test_post_list(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('post-list'))
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(len(response.data['results'][0]['comments']), 3)
+
+    def test_post_detail(self):
+        post = Post.objects.first()
+        with self.assertNumQueries(3):
+            self.client.get(reverse('post-detail', args=[post.pk]))
+
+    def test_comment_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('comment-list'))
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_feed(self):
+        timeline.get_celebrity_ids()
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('feed'))
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_comments_are_capped_per_post(self):
+        post = Post.objects.first()
+        Comment.objects.bulk_create(Comment(post=post, author=self.reader, content=str(i)) for i in range(15))
+        with mock.patch('posts.serializers.COMMENTS_PREVIEW_LIMIT', 5):
+            response = self.client.get(reverse('post-detail', args=[post.pk]))
+        self.assertEqual(len(response.data['comments']), 5)
+
+
+class CounterTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='password')
+        self.user = User.objects.create_user(username='user', password='password')
+        self.post = Post.objects.create(author=self.author, title='Post', content='content')
+        self.client.force_authenticate(self.user)
+
+    def test_like_and_unlike_update_like_count(self):
+        self.client.post(reverse('like_post', args=[self.post.pk]))
+        self.client.post(reverse('like_post', args=[self.post.pk]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.client.post(reverse('unlike_post', args=[self.post.pk]))
+        self.client.post(reverse('unlike_post', args=[self.post.pk]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_comment_create_and_destroy_update_comment_count(self):
+        self.client.post(reverse('comment-list'), {'post': self.post.pk, 'content': 'Nice'})
+        response = self.client.get(reverse('post-detail', args=[self.post.pk]))
+        self.assertEqual(response.data['comment_count'], 1)
+        self.client.delete(reverse('comment-detail', args=[response.data['comments'][0]['id']]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_comment_cannot_move_to_another_post(self):
+        other = Post.objects.create(author=self.author, title='Other', content='content')
+        comment = self.client.post(reverse('comment-list'), {'post': self.post.pk, 'content': 'Nice'}).data
+        url = reverse('comment-detail', args=[comment['id']])
+        response = self.client.patch(url, {'post': other.pk})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.patch(url, {'post': self.post.pk, 'content': 'Edited'}).status_code, 200)
+        counts = Post.objects.order_by('id').values_list('id', 'comment_count')
+        self.assertEqual(list(counts), [(self.post.pk, 1), (other.pk, 0)])
+        self.assertEqual(Comment.objects.get().post_id, self.post.pk)
+
+    def test_reconcile_post_counters(self):
+        other = Post.objects.create(author=self.author, title='Other', content='content')
+        Like.objects.create(user=self.user, post=self.post)
+        Comment.objects.create(post=self.post, author=self.user, content='Nice')
+        stdout = StringIO()
+        call_command('reconcile_post_counters', batch_size=1, stdout=stdout)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 1))
+        self.assertIn('Checked 2 posts, fixed 1.', stdout.getvalue())
+        other.refresh_from_db()
+        self.assertEqual((other.like_count, other.comment_count), (0, 0))
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='password')
+        Post.objects.create(author=self.user, title='Django tips', content='Use select_related for joins.')
+        Post.objects.create(author=self.user, title='Cooking', content='Django the cat watched me cook.')
+        Post.objects.create(author=self.user, title='Django, Django, Django', content='All about Django.')
+        Post.objects.create(author=self.user, title='Gardening', content='Nothing relevant here.')
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('post-list'), {'search': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_results_are_ranked(self):
+        titles = [post['title'] for post in self.search('django').data['results']]
+        self.assertEqual(titles[0], 'Django, Django, Django')
+        self.assertCountEqual(titles, ['Django tips', 'Cooking', 'Django, Django, Django'])
+
+    def test_ranked_results_paginate(self):
+        titles, url = [], None
+        response = self.search('django', page_size=2)
+        while True:
+            titles.extend(post['title'] for post in response.data['results'])
+            url = response.data['next']
+            if not url:
+                break
+            response = self.client.get(url)
+        self.assertEqual(len(titles), 3)
+        self.assertEqual(len(set(titles)), 3)
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.get(title='Gardening')
+        post.content = 'Tomatoes and basil.'
+        post.save()
+        self.assertEqual([p['title'] for p in self.search('basil').data['results']], ['Gardening'])
+        post.delete()
+        self.assertEqual(self.search('basil').data['results'], [])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.search('"unbalanced AND (').data['results'], [])
+
+    def test_rebuild_search_index(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('django').data['results']), 3)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        graph.clear()
+        self.reader = User.objects.create_user(username='reader', password='password')
+        self.author = User.objects.create_user(username='author', password='password')
+        self.reader.following.add(self.author)
+        self.post = Post.objects.create(author=self.author, title='Post', content='content')
+        timeline.fan_out_post(self.post)
+        self.client.force_authenticate(self.reader)
+
+    def assert_revalidates(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached['ETag'], etag)
+        return etag
+
+    def test_post_detail_etag_changes_with_likes(self):
+        url = reverse('post-detail', args=[self.post.pk])
+        etag = self.assert_revalidates(url)
+        self.client.post(reverse('like_post', args=[self.post.pk]))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_post_list_etag_changes_with_edits(self):
+        url = reverse('post-list')
+        etag = self.assert_revalidates(url)
+        self.post.title = 'Edited'
+        self.post.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def assert_deleting_the_top_row_revalidates(self, model, url, create):
+        # Three rows, one per page. The top row is the least recently updated, so
+        # once it is gone the next one slides onto the page with the same max
+        # updated_at and row count; only the row keys tell the pages apart.
+        create('third')
+        create('second')
+        top = create('first')
+        model.objects.filter(pk=top.pk).update(updated_at=top.updated_at - timedelta(days=1))
+        etag = self.assert_revalidates(url + '?page_size=1')
+        top.delete()
+        self.assertEqual(self.client.get(url + '?page_size=1', HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_post_list_etag_changes_when_a_post_is_deleted(self):
+        self.assert_deleting_the_top_row_revalidates(
+            Post, reverse('post-list'),
+            lambda title: Post.objects.create(author=self.author, title=title, content='content'),
+        )
+
+    def test_comment_list_etag_changes_when_a_comment_is_deleted(self):
+        self.assert_deleting_the_top_row_revalidates(
+            Comment, reverse('comment-list'),
+            lambda content: Comment.objects.create(post=self.post, author=self.reader, content=content),
+        )
+
+    def test_list_validators_only_read_the_page(self):
+        url = reverse('post-list') + '?page_size=1'
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        (query,) = queries.captured_queries
+        self.assertNotIn('COUNT(', query['sql'])
+        self.assertIn('LIMIT 2', query['sql'])
+
+    def test_detail_with_a_malformed_pk_is_not_found(self):
+        for url in ('/api/posts/abc/', '/api/comments/abc/'):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_comment_edit_changes_post_etag(self):
+        comment = Comment.objects.create(post=self.post, author=self.reader, content='first')
+        url = reverse('post-detail', args=[self.post.pk])
+        etag = self.assert_revalidates(url)
+        self.client.patch(reverse('comment-detail', args=[comment.pk]), {'content': 'edited'})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_feed_etag_changes_with_new_posts(self):
+        url = reverse('feed')
+        timeline.get_celebrity_ids()
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        timeline.fan_out_post(Post.objects.create(author=self.author, title='Newer', content='content'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_etag_is_per_user(self):
+        url = reverse('post-detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+
+class FeedCacheTests(FeedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create_user(username='other', password='password')
+        self.reader.following.add(self.author)
+        self.post = self.create_post(self.author, 'First')
+        timeline.get_celebrity_ids()
+
+    def test_repeat_requests_are_served_from_cache(self):
+        self.assertEqual(self.feed_titles(), ['First'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.feed_titles(), ['First'])
+
+    def test_pages_are_cached_per_cursor(self):
+        self.create_post(self.author, 'Second')
+        first = self.client.get(reverse('feed'), {'page_size': 1}).data
+        second = self.client.get(first['next']).data
+        self.assertEqual([p['title'] for p in first['results']], ['Second'])
+        self.assertEqual([p['title'] for p in second['results']], ['First'])
+
+    def test_new_post_from_followed_author_invalidates(self):
+        self.feed_titles()
+        self.create_post(self.author, 'Second')
+        self.assertEqual(self.feed_titles(), ['Second', 'First'])
+
+    def test_post_edit_and_delete_invalidate(self):
+        self.feed_titles()
+        self.post.title = 'Edited'
+        self.post.save()
+        self.assertEqual(self.feed_titles(), ['Edited'])
+        self.post.delete()
+        self.assertEqual(self.feed_titles(), [])
+
+    def test_follow_and_unfollow_invalidate(self):
+        self.create_post(self.other, 'Other')
+        self.feed_titles()
+        self.client.post(reverse('follow_user', args=[self.other.pk]))
+        self.assertEqual(self.feed_titles(), ['Other', 'First'])
+        self.client.post(reverse('unfollow_user', args=[self.author.pk]))
+        self.assertEqual(self.feed_titles(), ['Other'])
+
+    def as_other(self, method, url, data=None):
+        self.client.force_authenticate(self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url, data)
+        self.client.force_authenticate(self.reader)
+        return response
+
+    def test_likes_and_comments_by_others_invalidate(self):
+        self.feed_titles()
+        self.as_other('post', reverse('like_post', args=[self.post.pk]))
+        self.as_other('post', reverse('comment-list'), {'post': self.post.pk, 'content': 'Nice'})
+        post = self.client.get(reverse('feed')).data['results'][0]
+        self.assertEqual((post['like_count'], post['comment_count']), (1, 1))
+        self.as_other('post', reverse('unlike_post', args=[self.post.pk]))
+        self.assertEqual(self.client.get(reverse('feed')).data['results'][0]['like_count'], 0)
+
+    def test_comment_edit_by_another_user_invalidates(self):
+        comment = self.as_other('post', reverse('comment-list'), {'post': self.post.pk, 'content': 'first'}).data
+        self.feed_titles()
+        self.as_other('patch', reverse('comment-detail', args=[comment['id']]), {'content': 'edited'})
+        post = self.client.get(reverse('feed')).data['results'][0]
+        self.assertEqual([comment['content'] for comment in post['comments']], ['edited'])
+        self.as_other('delete', reverse('comment-detail', args=[comment['id']]))
+        post = self.client.get(reverse('feed')).data['results'][0]
+        self.assertEqual((post['comments'], post['comment_count']), ([], 0))
+
+    def test_celebrity_posts_invalidate(self):
+        with mock.patch.object(timeline, 'FANOUT_FOLLOWER_THRESHOLD', 1):
+            cache.delete(timeline.CELEBRITY_CACHE_KEY)
+            timeline.get_celebrity_ids()
+            self.feed_titles()
+            self.create_post(self.author, 'Second')
+            self.assertEqual(self.feed_titles(), ['Second', 'First'])
+
+    def test_celebrity_activity_only_invalidates_their_followers(self):
+        fan = User.objects.create_user(username='fan', password='password')
+        fan.following.add(self.other)
+        with mock.patch.object(timeline, 'FANOUT_FOLLOWER_THRESHOLD', 1):
+            cache.delete(timeline.CELEBRITY_CACHE_KEY)
+            self.assertEqual(timeline.get_celebrity_ids(), {self.author.pk, self.other.pk})
+            self.feed_titles()
+            other_post = self.create_post(self.other, 'Other')
+            self.as_other('post', reverse('like_post', args=[other_post.pk]))
+            with self.assertNumQueries(0):
+                self.assertEqual(self.feed_titles(), ['First'])
+            self.as_other('post', reverse('like_post', args=[self.post.pk]))
+            self.assertEqual(self.client.get(reverse('feed')).data['results'][0]['like_count'], 1)
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'data': 'page'}
+
+        threads = [
+            threading.Thread(target=feed_cache.get_or_compute, args=(self.reader.pk, '/feed/', compute))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(feed_cache.get_or_compute(self.reader.pk, '/feed/', compute), {'data': 'page'})
+
+
+class RankedFeedTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        graph.clear()
+        self.reader = User.objects.create_user(username='reader', password='password')
+        self.author = User.objects.create_user(username='author', password='password')
+        self.reader.following.add(self.author)
+        self.client.force_authenticate(self.author)
+        for title in ('Quiet', 'Popular', 'Discussed'):
+            self.client.post(reverse('post-list'), {'title': title, 'content': 'content'})
+        self.client.force_authenticate(self.reader)
+
+    def ranked_titles(self, **params):
+        response = self.client.get(reverse('feed'), {'mode': 'ranked', **params})
+        return [post['title'] for post in response.data['results']], response.data['next']
+
+    def refresh(self):
+        out = StringIO()
+        call_command('refresh_post_scores', stdout=out)
+        return out.getvalue()
+
+    def test_score_decays_by_half_life(self):
+        now = timezone.now()
+        liked, newer = ranking.score_batch(
+            [1, 0], [0, 0], [now, now + timedelta(seconds=ranking.HALF_LIFE)]
+        )
+        self.assertAlmostEqual(liked, newer)
+
+    def test_ranked_by_engagement(self):
+        self.assertEqual(self.ranked_titles()[0], ['Discussed', 'Popular', 'Quiet'])
+        Post.objects.filter(title='Popular').update(like_count=50)
+        Post.objects.filter(title='Discussed').update(comment_count=10)
+        self.assertIn('rescored 2', self.refresh())
+        cache.clear()
+        self.assertEqual(self.ranked_titles()[0], ['Popular', 'Discussed', 'Quiet'])
+
+    def test_refresh_only_touches_changed_and_unscored_posts(self):
+        self.assertIn('Scored 0 new posts, rescored 0', self.refresh())
+        post = Post.objects.create(author=self.author, title='Imported', content='content')
+        Post.objects.filter(title='Quiet').update(like_count=1)
+        self.assertIn('Scored 1 new posts, rescored 1', self.refresh())
+        self.assertTrue(PostScore.objects.filter(post=post).exists())
+
+    def test_ranked_pagination(self):
+        Post.objects.filter(title='Popular').update(like_count=50)
+        self.refresh()
+        titles, next_url = self.ranked_titles(page_size=1)
+        while next_url:
+            response = self.client.get(next_url)
+            titles += [post['title'] for post in response.data['results']]
+            next_url = response.data['next']
+        self.assertEqual(titles, ['Popular', 'Discussed', 'Quiet'])
+
+    def test_chronological_cursor_is_rejected(self):
+        cursor = self.client.get(reverse('feed'), {'page_size': 1}).data['next'].split('cursor=')[1]
+        response = self.client.get(reverse('feed'), {'mode': 'ranked', 'cursor': cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, {'like': '2/min', 'comment': '1/min'})
+class ThrottleTests(APITestCase):
+    def setUp(self):
+        throttling.get_store().clear()
+        self.user = User.objects.create_user(username='user', password='password')
+        self.other = User.objects.create_user(username='other', password='password')
+        self.posts = [Post.objects.create(author=self.other, title=str(i), content='content') for i in range(3)]
+        self.client.force_authenticate(self.user)
+
+    def like(self, post):
+        return self.client.post(reverse('like_post', args=[post.pk]))
+
+    def test_burst_then_rejected_without_queries(self):
+        self.assertEqual(self.like(self.posts[0]).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.like(self.posts[1]).status_code, status.HTTP_201_CREATED)
+        with self.assertNumQueries(0):
+            response = self.like(self.posts[2])
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+
+    def test_tokens_refill_over_time(self):
+        now = time.time()
+        with mock.patch('social_media_api.throttling.time.time', return_value=now):
+            self.like(self.posts[0])
+            self.like(self.posts[1])
+            self.assertEqual(self.like(self.posts[2]).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        with mock.patch('social_media_api.throttling.time.time', return_value=now + 30):
+            self.assertEqual(self.like(self.posts[2]).status_code, status.HTTP_201_CREATED)
+
+    def test_buckets_are_per_user_and_scope(self):
+        self.like(self.posts[0])
+        self.like(self.posts[1])
+        url = reverse('comment-list')
+        self.assertEqual(self.client.post(url, {'post': self.posts[0].pk, 'content': 'a'}).status_code, 201)
+        self.assertEqual(self.client.post(url, {'post': self.posts[0].pk, 'content': 'b'}).status_code, 429)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.like(self.posts[2]).status_code, status.HTTP_201_CREATED)
+
+
+class BenchmarkCommandTests(TransactionTestCase):
+    def test_report_and_baseline_comparison(self):
+        with tempfile.TemporaryDirectory() as directory:
+            report_path = os.path.join(directory, 'report.json')
+            options = {
+                'use_current_database': True, 'users': 12, 'follows_per_user': 3, 'posts': 30,
+                'comments': 30, 'likes': 30, 'requests': 11, 'warmup': 1, 'stdout': StringIO(), 'stderr': StringIO(),
+            }
+            cache.set('unrelated', 'kept')
+            call_command('benchmark', output=report_path, **options)
+            self.assertEqual(cache.get('unrelated'), 'kept')
+            with open(report_path) as f:
+                report = json.load(f)
+            self.assertEqual(report['meta']['rows']['posts'], 30)
+            feed = report['results']['feed:wsgi']
+            self.assertEqual(feed['status_codes'], {'200': 10})
+            self.assertLessEqual(feed['p50_ms'], feed['p95_ms'])
+            self.assertIsNotNone(feed['alloc_peak_kib_p50'])
+            self.assertIsNotNone(report['results']['feed:asgi']['alloc_peak_kib_p50'])
+            self.assertEqual(report['results']['like:asgi']['status_codes'].keys() - {'200', '201'}, set())
+            for name in ('feed', 'post_list', 'notifications'):
+                self.assertGreater(report['results'][f'{name}:asgi']['queries_per_request'], 0)
+                self.assertGreater(report['results'][f'{name}:wsgi']['queries_per_request'], 0)
+
+            stderr = StringIO()
+            call_command('benchmark', no_seed=True, baseline=report_path, **dict(options, stderr=stderr))
+            self.assertIn('feed:asgi', stderr.getvalue())
+
+
+class SeedSocialCommandTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        graph.clear()
+
+    def seed(self, prefix, seed=1):
+        call_command(
+            'seed_social', users=40, follows_per_user=5, posts=120, comments=150, likes=200,
+            batch_size=50, seed=seed, prefix=prefix, stdout=StringIO(),
+        )
+        users = User.objects.filter(username__startswith=prefix)
+        posts = Post.objects.filter(author__in=users).order_by('id')
+        return users, posts
+
+    def test_row_counts_and_derived_data(self):
+        users, posts = self.seed('a')
+        self.assertEqual(users.count(), 40)
+        self.assertEqual(posts.count(), 120)
+        self.assertEqual(Comment.objects.count(), 150)
+        self.assertEqual(Like.objects.count(), 200)
+        self.assertEqual(sum(posts.values_list('like_count', flat=True)), 200)
+        self.assertEqual(sum(posts.values_list('comment_count', flat=True)), 150)
+        self.assertEqual(PostScore.objects.count(), 120)
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertTrue(Notification.objects.filter(recipient__in=users).exists())
+
+    def test_generated_timestamps_are_kept(self):
+        _, posts = self.seed('a')
+        week_ago = timezone.now() - timedelta(days=7)
+        self.assertTrue(posts.filter(created_at__lt=week_ago, updated_at__lt=week_ago).exists())
+        self.assertTrue(Comment.objects.filter(created_at__lt=week_ago).exists())
+        self.assertTrue(Notification.objects.filter(timestamp__lt=week_ago).exists())
+        # The models themselves are untouched: new rows are still stamped with "now".
+        post = Post.objects.create(author=User.objects.first(), title='New', content='content')
+        self.assertGreater(post.created_at, week_ago)
+
+    def test_same_seed_gives_same_data(self):
+        _, first = self.seed('a')
+        _, second = self.seed('b')
+        _, other = self.seed('c', seed=2)
+        fields = ('title', 'content', 'like_count', 'comment_count')
+        self.assertEqual(list(first.values_list(*fields)), list(second.values_list(*fields)))
+        self.assertNotEqual(list(first.values_list(*fields)), list(other.values_list(*fields)))
+
+    def test_prefix_must_be_unused(self):
+        User.objects.create_user(username='a0', password='password')
+        with self.assertRaises(CommandError):
+            self.seed('a')
+
+
+class InstrumentationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        instrumentation.histogram.clear()
+        self.user = User.objects.create_user(username='user', password='password')
+        self.client.force_authenticate(self.user)
+
+    def test_headers_report_queries_and_timings(self):
+        response = self.client.get(reverse('post-list'))
+        self.assertGreater(int(response['X-Query-Count']), 0)
+        self.assertRegex(
+            response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", view;dur=[\d.]+, render;dur=[\d.]+, total;dur='
+        )
+        self.assertNotIn('X-Duplicate-Queries', response)
+
+    def test_view_timing_covers_serialization(self):
+        to_representation = PostSerializer.to_representation
+
+        def slow_to_representation(serializer, instance):
+            time.sleep(0.05)
+            return to_representation(serializer, instance)
+
+        post = Post.objects.create(author=self.user, title='Post', content='content')
+        with mock.patch.object(PostSerializer, 'to_representation', slow_to_representation):
+            response = self.client.get(reverse('post-detail', args=[post.pk]))
+        timings = dict(part.split(';')[:2] for part in response['Server-Timing'].split(', '))
+        self.assertGreaterEqual(float(timings['view'].removeprefix('dur=')), 50)
+        self.assertLess(float(timings['render'].removeprefix('dur=')), 50)
+
+    def test_duplicate_queries_are_flagged_with_a_stack_sample(self):
+        recorder = instrumentation.QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for _ in range(instrumentation.DUPLICATE_THRESHOLD):
+                Post.objects.filter(pk=1).exists()
+            Post.objects.count()
+        [(sql, count)] = recorder.duplicates.items()
+        self.assertEqual(count, instrumentation.DUPLICATE_THRESHOLD)
+        self.assertIn('test_duplicate_queries_are_flagged_with_a_stack_sample', recorder.samples[sql])
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('post-list'))
+        self.client.get(reverse('post-list'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(User.objects.create_user(username='staff', password='password', is_staff=True))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        labels = 'method="GET",route="api/posts/",status="200"'
+        self.assertIn(f'django_request_duration_seconds_count{{{labels}}} 2', response.content.decode())
+        self.assertIn(f'django_request_queries_sum{{{labels}}}', response.content.decode())
+
+    def test_metrics_can_be_made_public(self):
+        self.client.logout()
+        with mock.patch.object(instrumentation, 'METRICS_PUBLIC', True):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    def test_histogram_drops_slots_outside_the_window(self):
+        histogram = instrumentation.RollingHistogram(buckets=(0.1, 1), window=60, slots=6)
+        labels = ('GET', 'api/posts/', 200)
+        histogram.observe(labels, 0.05, 0.01, 2, 0, now=0)
+        histogram.observe(labels, 0.5, 0.01, 2, 0, now=30)
+        self.assertEqual(histogram.snapshot(now=30)[labels]['buckets'], [1, 2])
+        self.assertEqual(histogram.snapshot(now=65)[labels]['count'], 1)
+        self.assertEqual(histogram.snapshot(now=100), {})
+
+
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', password='password')
+        self.client.force_authenticate(self.user)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = profiling.ProfileStore(directory.name)
+        for name, value in (('store', self.store), ('SECRET', 'letmein'), ('INTERVAL', 0.001)):
+            patcher = mock.patch.object(profiling, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def slow_feed(self):
+        render_page = FeedView.render_page
+
+        def slow_render_page(view, request):
+            time.sleep(0.05)
+            return render_page(view, request)
+
+        return mock.patch.object(FeedView, 'render_page', slow_render_page)
+
+    def test_header_writes_collapsed_stacks_per_view(self):
+        with self.slow_feed():
+            self.client.get(reverse('feed'), headers={'X-Profile': 'letmein'})
+        with open(self.store.path('posts.views.FeedView')) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertGreater(int(count), 0)
+        self.assertIn('posts.views:get', stack)
+        self.assertNotIn('common.profiling', stack)
+
+    def test_requests_without_a_trigger_are_not_profiled(self):
+        with self.slow_feed():
+            self.client.get(reverse('feed'), headers={'X-Profile': 'wrong'})
+        self.assertFalse(os.path.exists(self.store.path('posts.views.FeedView')))
+
+    def test_middleware_is_removed_without_triggers(self):
+        with mock.patch.object(profiling, 'SECRET', None):
+            with self.assertRaises(MiddlewareNotUsed):
+                profiling.SamplingProfilerMiddleware(lambda request: None)
+
+
+class StreamingFeedTests(FeedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.celebrity = User.objects.create_user(username='celebrity', password='password')
+        self.reader.following.add(self.author, self.celebrity)
+        for i in range(3):
+            self.create_post(self.author, f'Author {i}')
+        with mock.patch.object(timeline, 'FANOUT_FOLLOWER_THRESHOLD', 1):
+            # Both authors are now cached as celebrities, so the new post is merged at read time.
+            cache.clear()
+            self.create_post(self.celebrity, 'Celebrity')
+        self.assertFalse(TimelineEntry.objects.filter(post__author=self.celebrity).exists())
+        self.create_post(User.objects.create_user(username='stranger', password='password'), 'Not followed')
+
+    def stream(self, stream_format, **params):
+        response = self.client.get(reverse('feed'), {'stream': stream_format, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_json_stream_matches_the_paged_feed(self):
+        paged = self.client.get(reverse('feed'), {'page_size': 100}).json()['results']
+        streamed = json.loads(self.stream('json'))
+        self.assertEqual(streamed, paged)
+        self.assertEqual([post['title'] for post in streamed], ['Celebrity', 'Author 2', 'Author 1', 'Author 0'])
+
+    def test_ndjson_stream_has_one_post_per_line(self):
+        lines = self.stream('ndjson').splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['Celebrity', 'Author 2', 'Author 1', 'Author 0'])
+
+    def test_ranked_stream(self):
+        Post.objects.filter(title='Author 0').update(like_count=50)
+        ranking.refresh_scores()
+        titles = [json.loads(line)['title'] for line in self.stream('ndjson', mode='ranked').splitlines()]
+        self.assertEqual(titles[0], 'Author 0')
+        self.assertEqual(len(titles), 4)
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get(reverse('feed'), {'stream': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CompiledSerializerTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='password')
+        self.other = User.objects.create_user(username='other', password='password')
+        posts = [Post.objects.create(author=self.user, title=f'Post {i}', content='content') for i in range(3)]
+        posts.append(Post.objects.create(author=self.other, title='Ünïcode', content='"quoted"\n'))
+        for i in range(COMMENTS_PREVIEW_LIMIT + 3):
+            Comment.objects.create(post=posts[0], author=self.other, content=f'Comment {i}')
+        Comment.objects.create(post=posts[1], author=self.user, content='Only one')
+        Like.objects.create(user=self.user, post=posts[1])
+        request = APIRequestFactory().get('/')
+        request.user = self.user
+        self.context = {'request': request}
+
+    def assertSameOutput(self, serializer_class, queryset):
+        expected = serializer_class(queryset, many=True, context=self.context).data
+        compiled = get_compiled(serializer_class).serialize(queryset, self.context)
+        self.assertTrue(compiled)
+        self.assertEqual(JSONRenderer().render(compiled), JSONRenderer().render(expected))
+
+    def test_post_serializer_parity(self):
+        for user in (self.user, AnonymousUser()):
+            queryset = PostSerializer.annotate_for_user(Post.objects.order_by('id'), user)
+            self.assertSameOutput(PostSerializer, PostSerializer.setup_eager_loading(queryset))
+
+    def test_comment_serializer_parity(self):
+        self.assertSameOutput(CommentSerializer, Comment.objects.order_by('-created_at', '-id'))
+
+    def test_list_endpoint_queries_do_not_grow_with_rows(self):
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('post-list'))
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertEqual(len(response.data['results'][-1]['comments']), COMMENTS_PREVIEW_LIMIT)
+
+    def test_unsupported_fields_are_rejected(self):
+        class WholeObjectSerializer(serializers.Serializer):
+            post = serializers.CharField(source='*')
+
+        with self.assertRaises(ImproperlyConfigured):
+            CompiledSerializer(WholeObjectSerializer)
+
+
+class FastJSONTests(APITestCase):
+    data = {
+        'created_at': timezone.now(),
+        'day': timezone.now().date(),
+        'price': Decimal('1.10'),
+        'message': gettext_lazy('Not found.'),
+        'text': 'Ünïcode "quoted"\u2028line',
+        1: [None, True, 2.5, 2 ** 70],
+    }
+
+    def test_renders_the_same_bytes_as_drf(self):
+        expected = JSONRenderer().render(self.data)
+        self.assertEqual(renderers.FastJSONRenderer().render(self.data), expected)
+        self.assertEqual(renderers.dumps(self.data), expected)
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(renderers.FastJSONRenderer().render(self.data), expected)
+        indented = renderers.FastJSONRenderer().render(self.data, 'application/json; indent=4')
+        self.assertEqual(indented, JSONRenderer().render(self.data, 'application/json; indent=4'))
+
+    def test_non_finite_floats_are_rejected_like_drf(self):
+        for value in (float('nan'), float('inf'), float('-inf')):
+            data = {'next': None, 'results': [{'score': 1.5}, {'score': (value, 1)}]}
+            with self.assertRaisesMessage(ValueError, 'Out of range float values are not JSON compliant'):
+                JSONRenderer().render(data)
+            with self.assertRaisesMessage(ValueError, 'Out of range float values are not JSON compliant'):
+                renderers.FastJSONRenderer().render(data)
+        self.assertFalse(renderers.has_non_finite_float({'next': None, 'results': [{'score': 1.5}]}))
+
+    def test_parser(self):
+        parser = renderers.FastJSONParser()
+        self.assertEqual(parser.parse(BytesIO('{"a": ["ü", 1]}'.encode())), {'a': ['ü', 1]})
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b'{"a": NaN}'))
+
+    def test_api_uses_fast_json(self):
+        user = User.objects.create_user(username='user', password='password')
+        self.client.force_authenticate(user)
+        response = self.client.post(reverse('post-list'), {'title': 'Ünï', 'content': 'c'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsInstance(response.accepted_renderer, renderers.FastJSONRenderer)
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
@@ -0,0 +1,227 @@
+"""
+Materialized home timelines.
+
+Every post is copied into the timeline of each follower when it is created
+(fan-out on write), so reading a feed is a range scan over the reader's own
+timeline rows. Authors with more followers than
+``FEED_FANOUT_FOLLOWER_THRESHOLD`` are skipped at write time and their posts
+are merged into the feed at read time instead. When an unfollow takes an
+author back below the threshold, a background worker fans their recent posts
+out after the unfollow commits, since the read-time merge stops covering them;
+the unfollow request itself only touches the reader's own timeline.
+"""
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from accounts import graph
+from . import feed_cache
+from .models import Post, TimelineEntry
+
+User = get_user_model()
+Follow = User.following.through
+
+FANOUT_FOLLOWER_THRESHOLD = getattr(settings, 'FEED_FANOUT_FOLLOWER_THRESHOLD', 5000)
+BACKFILL_LIMIT = getattr(settings, 'FEED_BACKFILL_LIMIT', 200)
+BATCH_SIZE = 1000
+
+CELEBRITY_CACHE_KEY = 'posts:timeline:celebrities'
+CELEBRITY_CACHE_TIMEOUT = 300
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='timelines')
+
+
+def get_celebrity_ids():
+    """Ids of authors whose posts are merged at read time instead of fanned out."""
+    ids = cache.get(CELEBRITY_CACHE_KEY)
+    if ids is None:
+        ids = set(
+            Follow.objects.values('to_customuser')
+            .annotate(follower_count=Count('id'))
+            .filter(follower_count__gte=FANOUT_FOLLOWER_THRESHOLD)
+            .values_list('to_customuser', flat=True)
+        )
+        cache.set(CELEBRITY_CACHE_KEY, ids, CELEBRITY_CACHE_TIMEOUT)
+    return ids
+
+
+def bulk_insert(entries):
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            break
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Copy a new post into the timeline of every follower of its author."""
+    celebrity_ids = get_celebrity_ids()
+    if post.author_id not in celebrity_ids:
+        _fan_out(post)
+    feed_cache.invalidate_author(post.author_id, celebrity_ids)
+
+
+def _fan_out(post):
+    follower_ids = Follow.objects.filter(to_customuser=post.author_id).values_list('from_customuser', flat=True)
+    bulk_insert(
+        TimelineEntry(user_id=follower_id, post_id=post.pk, author_id=post.author_id, created_at=post.created_at)
+        for follower_id in follower_ids.iterator(chunk_size=BATCH_SIZE)
+    )
+
+
+def backfill(user, author):
+    """Seed ``user``'s timeline with the most recent posts of a newly followed author."""
+    backfill_many(user, [author.pk])
+
+
+def _recent_posts(author_ids):
+    """``(id, author_id, created_at)`` of the latest ``BACKFILL_LIMIT`` posts of each author."""
+    return (
+        Post.objects.filter(author_id__in=author_ids)
+        .annotate(rank=Window(RowNumber(), partition_by=F('author_id'), order_by=(F('created_at').desc(), F('id').desc())))
+        .filter(rank__lte=BACKFILL_LIMIT)
+        .values_list('id', 'author_id', 'created_at')
+    )
+
+
+def backfill_many(user, author_ids):
+    """Backfill several newly followed authors with a single windowed query."""
+    author_ids = set(author_ids) - get_celebrity_ids()
+    if not author_ids:
+        return
+    bulk_insert(
+        TimelineEntry(user_id=user.pk, post_id=post_id, author_id=author_id, created_at=created_at)
+        for post_id, author_id, created_at in _recent_posts(author_ids).iterator(chunk_size=BATCH_SIZE)
+    )
+
+
+def backfill_followers(author_ids):
+    """Fan the recent posts of ``author_ids`` out to every one of their followers."""
+    followers = {}
+    for author_id, follower_id in Follow.objects.filter(to_customuser__in=author_ids).values_list(
+        'to_customuser', 'from_customuser'
+    ).iterator(chunk_size=BATCH_SIZE):
+        followers.setdefault(author_id, []).append(follower_id)
+    bulk_insert(
+        TimelineEntry(user_id=follower_id, post_id=post_id, author_id=author_id, created_at=created_at)
+        for post_id, author_id, created_at in _recent_posts(author_ids).iterator(chunk_size=BATCH_SIZE)
+        for follower_id in followers.get(author_id, ())
+    )
+
+
+def prune(user, author):
+    """Drop an unfollowed author's posts from ``user``'s timeline."""
+    prune_many(user, [author.pk])
+
+
+def prune_many(user, author_ids):
+    TimelineEntry.objects.filter(user=user, author_id__in=author_ids).delete()
+    author_ids = set(author_ids)
+    transaction.on_commit(lambda: _executor.submit(_restore_demoted_in_worker, author_ids))
+
+
+def _restore_demoted_in_worker(author_ids):
+    try:
+        restore_demoted(author_ids)
+    finally:
+        close_old_connections()
+
+
+def restore_demoted(author_ids):
+    """
+    Fan out the posts of authors who just lost celebrity status.
+
+    Their posts were only merged at read time, which stops once they fall under
+    the threshold. An author counts as demoted when they are in the celebrity
+    set or just lost their threshold-th follower, so the check holds even when
+    the cached set was refreshed in between.
+    """
+    author_ids = set(author_ids)
+    counts = dict(
+        Follow.objects.filter(to_customuser__in=author_ids)
+        .values('to_customuser')
+        .annotate(follower_count=Count('id'))
+        .values_list('to_customuser', 'follower_count')
+    )
+    celebrity_ids = get_celebrity_ids()
+    demoted = [
+        author_id for author_id in author_ids
+        if counts.get(author_id, 0) < FANOUT_FOLLOWER_THRESHOLD
+        and (author_id in celebrity_ids or counts.get(author_id, 0) == FANOUT_FOLLOWER_THRESHOLD - 1)
+    ]
+    if demoted:
+        backfill_followers(demoted)
+        cache.delete(CELEBRITY_CACHE_KEY)
+
+
+def keyset_before(before, field, pk_field):
+    value, pk = before
+    return Q(**{f'{field}__lt': value}) | Q(**{field: value, f'{pk_field}__lt': pk})
+
+
+def get_feed_keys(user, limit, before=None):
+    """
+    Return up to ``limit`` ``(created_at, post_id)`` pairs for ``user``'s feed,
+    newest first, strictly older than the ``before`` pair when given.
+    """
+    entries = TimelineEntry.objects.filter(user=user)
+    if before is not None:
+        entries = entries.filter(keyset_before(before, 'created_at', 'post_id'))
+    sources = [entries.order_by('-created_at', '-post_id').values_list('created_at', 'post_id')[:limit]]
+
+    celebrity_ids = get_celebrity_ids()
+    if celebrity_ids:
+        followed = graph.get_following_ids(user.pk) & celebrity_ids
+        if followed:
+            posts = Post.objects.filter(author_id__in=followed)
+            if before is not None:
+                posts = posts.filter(keyset_before(before, 'created_at', 'id'))
+            sources.append(posts.order_by('-created_at', '-id').values_list('created_at', 'id')[:limit])
+    return merge_keys(sources, limit)
+
+
+def feed_filter(user):
+    """A ``Q`` matching every post in ``user``'s feed, for reading the whole feed in one query."""
+    in_feed = Q(pk__in=TimelineEntry.objects.filter(user=user).values('post_id'))
+    followed = graph.get_following_ids(user.pk) & get_celebrity_ids()
+    if followed:
+        in_feed |= Q(author_id__in=followed)
+    return in_feed
+
+
+def get_feed_queryset(user):
+    """All of ``user``'s feed, newest first."""
+    return Post.objects.filter(feed_filter(user)).order_by('-created_at', '-id')
+
+
+def merge_keys(sources, limit):
+    """Merge descending ``(sort_key, post_id)`` sources, dropping duplicate posts."""
+    keys, seen = [], set()
+    for sort_key, post_id in heapq.merge(*sources, reverse=True):
+        if post_id in seen:
+            continue
+        seen.add(post_id)
+        keys.append((sort_key, post_id))
+        if len(keys) == limit:
+            break
+    return keys
+
+
+def get_feed_posts(user, limit, before=None, queryset=None):
+    """Like :func:`get_feed_keys` but returns the ``Post`` instances in feed order."""
+    return load_posts([post_id for _, post_id in get_feed_keys(user, limit, before)], queryset)
+
+
+def load_posts(ids, queryset=None):
+    """Fetch posts by id, preserving the order of ``ids``."""
+    if queryset is None:
+        queryset = Post.objects.all()
+    posts = queryset.in_bulk(ids)
+    return [posts[post_id] for post_id in ids if post_id in posts]
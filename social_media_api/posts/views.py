@@ -1,9 +1,27 @@
-from rest_framework import viewsets, permissions, filters, generics
-from rest_framework.views import APIView
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import viewsets, permissions, generics, status
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
-from .models import Post, Comment, Like
+from rest_framework.settings import api_settings
+from .models import Post, Comment
+from .search import FullTextSearchFilter
 from .serializers import PostSerializer, CommentSerializer
-from notifications.models import Notification
+from notifications import queue as notifications
+from social_media_api.conditional import ConditionalGetMixin, get_validators, not_modified, set_validators
+from common import streaming
+from common.compiled import CompiledListMixin, get_compiled
+from social_media_api.mixins import EagerLoadingMixin
+from . import feed_cache, likes, ranking, timeline
+
+User = get_user_model()
+
+def invalidate_post_feeds(author_id):
+    # Feed pages embed each post's counts and comments, so a like or comment
+    # changes every feed that shows the post, not just the caller's.
+    transaction.on_commit(lambda: feed_cache.invalidate_author(author_id, timeline.get_celebrity_ids()))
 
 class IsAuthorOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
@@ -11,67 +29,143 @@ class IsAuthorOrReadOnly(permissions.BasePermission):
             return True
         return obj.author == request.user
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ConditionalGetMixin, CompiledListMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ['title', 'content']
+    conditional_fields = ('like_count', 'comment_count')
+
+    @property
+    def keyset_ordering(self):
+        # Search results are paginated by relevance instead of recency.
+        if self.request.query_params.get(api_settings.SEARCH_PARAM, '').strip():
+            return ('-search_rank', '-id')
+        return ('-created_at', '-id')
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+        ranking.create_score(post)
+        timeline.fan_out_post(post)
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ConditionalGetMixin, CompiledListMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
 
+    @property
+    def throttle_scope(self):
+        # Only new comments are throttled; reads and edits are not.
+        return 'comment' if self.action == 'create' else None
+
+    @transaction.atomic
     def perform_create(self, serializer):
         comment = serializer.save(author=self.request.user)
+        Post.objects.filter(pk=comment.post_id).update(comment_count=F('comment_count') + 1)
+        invalidate_post_feeds(comment.post.author_id)
         # Create notification for post author
         if comment.post.author != self.request.user:
-            Notification.objects.create(
-                recipient=comment.post.author,
-                actor=self.request.user,
-                verb="commented on your post",
-                target=comment.post
-            )
-
-class FeedView(APIView):
+            notifications.notify(comment.post.author, self.request.user, "commented on your post", comment.post)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        comment = serializer.save()
+        # Posts embed their comments, so an edit must change the post's validators too.
+        Post.objects.filter(pk=comment.post_id).update(updated_at=timezone.now())
+        invalidate_post_feeds(comment.post.author_id)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        Post.objects.filter(pk=instance.post_id).update(comment_count=F('comment_count') - 1)
+        invalidate_post_feeds(instance.post.author_id)
+        instance.delete()
+
+class FeedView(generics.GenericAPIView):
+    serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        following_users = request.user.following.all()
-        posts = Post.objects.filter(author__in=following_users).order_by('-created_at')
-        serializer = PostSerializer(posts, many=True)
-        return Response(serializer.data)
+        stream_format = streaming.get_stream_format(request)
+        if stream_format is not None:
+            # The whole feed, read with a server-side iterator; it bypasses the page cache.
+            serialize = self.get_serializer().to_representation
+            return streaming.stream_response(self.get_stream_queryset(), serialize, stream_format)
+        entry = feed_cache.get_or_compute(
+            request.user.pk, request.get_full_path(), lambda: self.render_page(request), timeline.get_celebrity_ids()
+        )
+        response = not_modified(request, entry['etag'], entry['last_modified'])
+        if response is None:
+            response = Response(entry['data'])
+        return set_validators(response, entry['etag'], entry['last_modified'])
+
+    @property
+    def ranked(self):
+        return self.request.query_params.get('mode') == 'ranked'
+
+    @property
+    def keyset_ordering(self):
+        return ('-feed_score', '-id') if self.ranked else ('-created_at', '-id')
+
+    def get_feed_keys(self, limit, position):
+        if not self.ranked:
+            return timeline.get_feed_keys(self.request.user, limit, before=position)
+        return ranking.get_feed_keys(self.request.user, limit, before=position)
+
+    def get_stream_queryset(self):
+        user = self.request.user
+        queryset = ranking.get_feed_queryset(user) if self.ranked else timeline.get_feed_queryset(user)
+        return PostSerializer.annotate_for_user(PostSerializer.setup_eager_loading(queryset), user)
+
+    def render_page(self, request):
+        paginator = self.paginator
+        paginator.prepare(request, self)
+        position = paginator.decode_cursor(request)
+        keys = self.get_feed_keys(paginator.page_size + 1, position)
+        ids = [post_id for _, post_id in keys]
+        etag, last_modified = get_validators(
+            request, Post.objects.filter(pk__in=ids).order_by('pk'), PostViewSet.conditional_fields
+        )
+        compiled = get_compiled(PostSerializer)
+        queryset = PostSerializer.annotate_for_user(Post.objects.filter(pk__in=ids), request.user)
+        rows = {row['id']: row for row in compiled.values(queryset)}
+        page = []
+        for score, post_id in keys:
+            if post_id in rows:
+                rows[post_id]['feed_score'] = score
+                page.append(rows[post_id])
+        page = paginator.paginate_rows(page)
+        data = paginator.get_paginated_response(compiled.represent(page, self.get_serializer_context())).data
+        # Plain containers only, so the page can be pickled by any cache backend.
+        return {'data': dict(data), 'etag': etag, 'last_modified': last_modified}
 
 class LikePostView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'like'
 
     def post(self, request, pk):
-        post = generics.get_object_or_404(Post, pk=pk)
-        like, created = Like.objects.get_or_create(user=request.user, post=post)
+        try:
+            created, like_count, author_id = likes.like(request.user.pk, pk)
+        except Post.DoesNotExist:
+            raise NotFound()
         if not created:
-            return Response({"message": "You have already liked this post."}, status=status.HTTP_400_BAD_REQUEST)
-        
+            return Response({"liked": True, "like_count": like_count}, status=status.HTTP_200_OK)
+        invalidate_post_feeds(author_id)
+
         # Create notification
-        if post.author != request.user:
-            Notification.objects.create(
-                recipient=post.author,
-                actor=request.user,
-                verb="liked your post",
-                target=post
-            )
-        return Response({"message": "Post liked successfully."}, status=status.HTTP_201_CREATED)
+        if author_id != request.user.pk:
+            notifications.notify(User(pk=author_id), request.user, "liked your post", Post(pk=pk))
+        return Response({"liked": True, "like_count": like_count}, status=status.HTTP_201_CREATED)
 
 class UnlikePostView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'like'
 
     def post(self, request, pk):
-        post = generics.get_object_or_404(Post, pk=pk)
-        like = Like.objects.filter(user=request.user, post=post).first()
-        if like:
-            like.delete()
-            return Response({"message": "Post unliked successfully."}, status=status.HTTP_200_OK)
-        return Response({"message": "You have not liked this post."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            deleted, like_count, author_id = likes.unlike(request.user.pk, pk)
+        except Post.DoesNotExist:
+            raise NotFound()
+        if deleted:
+            invalidate_post_feeds(author_id)
+        return Response({"liked": False, "like_count": like_count}, status=status.HTTP_200_OK)
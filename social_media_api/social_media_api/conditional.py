@@ -0,0 +1,71 @@
+"""
+Conditional GET support (ETag / Last-Modified) for list and detail endpoints.
+
+Validators come from one query over the requested page's keyset window, the
+same ``page_size + 1`` rows the paginator reads, so their cost doesn't grow with
+the table. The ETag hashes each row's primary key, ``updated_at`` and any extra
+``conditional_fields`` declared by the view; ``Last-Modified`` is the latest
+``updated_at``. Hashing the keys means a deleted row, which leaves the surviving
+rows' ``updated_at`` untouched, still changes the ETag of every page it shifts.
+The request path (and so the cursor) is part of the ETag, so each page gets its
+own. When the client's ``If-None-Match`` or ``If-Modified-Since`` still matches,
+a 304 is returned before the page is serialized.
+"""
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def get_validators(request, queryset, fields=()):
+    rows = list(queryset.values_list('pk', 'updated_at', *fields))
+    if not rows:
+        return None, None
+    last_modified = max(row[1] for row in rows)
+    # Representations can depend on the user (e.g. liked_by_me) and on query parameters.
+    source = repr((rows, request.user.pk, request.get_full_path()))
+    etag = quote_etag(hashlib.md5(source.encode('utf-8'), usedforsecurity=False).hexdigest())
+    return etag, last_modified.timestamp() if last_modified else None
+
+
+def not_modified(request, etag, last_modified):
+    if etag is None:
+        return None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified):
+    if etag is not None and response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    conditional_fields = ()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.paginator is not None:
+            queryset = self.paginator.get_page_queryset(queryset, request, self)
+        etag, last_modified = get_validators(request, queryset, self.conditional_fields)
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            rows = self.get_queryset().filter(**{self.lookup_field: lookup})
+        except (TypeError, ValueError, ValidationError):
+            # A lookup that can't be cast to the field's type, as get_object_or_404 treats it.
+            raise Http404
+        etag, last_modified = get_validators(request, rows, self.conditional_fields)
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
@@ -0,0 +1,18 @@
+class EagerLoadingMixin:
+    """
+    Let the serializer declare the relations it reads.
+
+    Serializers that define a ``setup_eager_loading(queryset)`` static method get it
+    applied to the view's queryset, so nested fields never trigger per-row queries.
+    Fields that depend on the requesting user are annotated by an optional
+    ``annotate_for_user(queryset, user)`` static method.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, 'setup_eager_loading'):
+            queryset = serializer_class.setup_eager_loading(queryset)
+        if hasattr(serializer_class, 'annotate_for_user'):
+            queryset = serializer_class.annotate_for_user(queryset, self.request.user)
+        return queryset
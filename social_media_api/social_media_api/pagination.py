@@ -0,0 +1,152 @@
+import base64
+import datetime
+import json
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def _parse_datetime(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f'Invalid datetime: {value!r}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on the full ordering tuple, ``(created_at, id)`` by default.
+
+    Each page is fetched with ``WHERE (created_at, id) < cursor ORDER BY ... LIMIT n + 1``
+    so deep pages cost the same as the first one and no ``COUNT(*)`` is issued.
+    Views can override the ordering with a ``keyset_ordering`` attribute.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+    # How each ordering field is read back from a cursor; cursors come from clients.
+    cursor_parsers = {
+        'id': int,
+        'created_at': _parse_datetime,
+        'timestamp': _parse_datetime,
+        'feed_score': float,
+        'search_rank': float,
+    }
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_rows(list(self.get_page_queryset(queryset, request, view)))
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """The ordered, filtered and sliced queryset for the requested page (plus one row)."""
+        self.prepare(request, view)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+        return queryset[:self.page_size + 1]
+
+    def prepare(self, request, view=None):
+        self.request = request
+        self.ordering = getattr(view, 'keyset_ordering', self.ordering)
+        self.page_size = self.get_page_size(request)
+
+    def paginate_rows(self, rows):
+        """Trim an already ordered list of ``page_size + 1`` rows to a page."""
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_keyset_filter(self, position):
+        query, equal = Q(), {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            query |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return query
+
+    def get_position(self, row):
+        position = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            if isinstance(row, dict):
+                # A .values() row, as read by compiled serializers.
+                position.append(row[name])
+                continue
+            value = row
+            for attr in name.split('__'):
+                value = getattr(value, attr)
+            position.append(value)
+        return position
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [self.parse_value(field.lstrip('-'), value) for field, value in zip(self.ordering, position)]
+        except (TypeError, ValueError, OverflowError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def parse_value(self, name, value):
+        parser = self.cursor_parsers.get(name)
+        if parser is None:
+            raise ValueError(f'No cursor parser for {name!r}')
+        return parser(value)
+
+    def encode_cursor(self, position):
+        encoded = json.dumps(position, default=self.encode_value, separators=(',', ':'))
+        return base64.urlsafe_b64encode(encoded.encode('utf-8')).decode('ascii')
+
+    def encode_value(self, value):
+        # Keep full microsecond precision; truncating would skip or repeat rows.
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        return str(value)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        cursor = self.encode_cursor(self.get_position(self.page[-1]))
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -10,11 +10,15 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# The shared ``common`` package lives at the repository root.
+sys.path.append(str(BASE_DIR.parent))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/6.0/howto/deployment/checklist/
@@ -47,16 +51,119 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'common.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'common.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PARSER_CLASSES': [
+        'common.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'social_media_api.pagination.KeysetPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'social_media_api.throttling.TokenBucketThrottle',
+    ],
+    # Token buckets per user: "<burst>/<refill period>".
+    'DEFAULT_THROTTLE_RATES': {
+        'like': '60/min',
+        'comment': '20/min',
+        'follow': '30/min',
+        'bulk_follow': '5/min',
+    },
+}
+
+# Set BACKEND to 'social_media_api.throttling.CacheBucketStore' to share throttle
+# buckets between processes through the CACHES alias named by CACHE.
+THROTTLE_BUCKETS = {
+    'BACKEND': 'social_media_api.throttling.LocalBucketStore',
+    'MAXSIZE': 100000,
+    'CACHE': 'default',
+}
+
+# Follower id sets are cached per process for TTL seconds; set SHARED_CACHE to a
+# CACHES alias shared by all processes so follows made in one are seen by all.
+FOLLOWER_GRAPH_CACHE = {
+    'MAXSIZE': 10000,
+    'TTL': 30,
+    'SHARED_CACHE': None,
+}
+
+# Token -> user lookups are cached in-process; set SHARED_CACHE to a CACHES alias
+# to share them between processes as well.
+TOKEN_AUTH_CACHE = {
+    'MAXSIZE': 10000,
+    'TTL': 60,
+    'SHARED_CACHE': None,
+}
+
+# Rendered feed pages are cached per user in the CACHES alias named by CACHE; use a
+# file-based or shared cache when several processes serve the API.
+FEED_CACHE = {
+    'CACHE': 'default',
+    'TIMEOUT': 30,
+    'LOCK_TIMEOUT': 10,
+    'LOCK_WAIT': 2,
+}
+
+# Scores for the ?mode=ranked feed; run `manage.py refresh_post_scores` periodically.
+FEED_RANKING = {
+    'LIKE_WEIGHT': 1.0,
+    'COMMENT_WEIGHT': 2.0,
+    'HALF_LIFE_HOURS': 6,
+    'CANDIDATE_WINDOW_HOURS': 72,
+}
+
+# Unread badge counts are cached in the CACHES alias named by CACHE. It must be shared
+# by every process (Redis, Memcached, a database cache): the default locmem cache is
+# only correct with a single process. None counts unread rows on every read.
+UNREAD_COUNTERS = {
+    'CACHE': 'default',
+    'TIMEOUT': 300,
+}
+
+# Notifications are queued by the views and written in batches by a background worker.
+NOTIFICATIONS_QUEUE = {
+    'BACKEND': 'notifications.queue.LocalQueue',
+    'BATCH_SIZE': 500,
+    'AUTO_FLUSH': True,
+}
+
+# Connected notification streams (SSE and WebSocket) are fed through this hub.
+NOTIFICATIONS_HUB = {
+    'BACKEND': 'notifications.hub.LocalBroker',
+    'KEEPALIVE_INTERVAL': 15,
+}
+
+# Per-request query counts and timings; a rolling histogram is served at /_metrics,
+# to staff users only unless METRICS_PUBLIC is set.
+INSTRUMENTATION = {
+    'HEADERS': True,
+    'DUPLICATE_THRESHOLD': 3,
+    'METRICS_PUBLIC': False,
+    'WINDOW_SECONDS': 300,
+}
+
+# Opt-in sampling profiler; collapsed stacks per view are written to OUTPUT_DIR.
+# Send the HEADER with SECRET (any value under DEBUG), set a SAMPLE_RATE or list PATHS.
+PROFILING = {
+    'HEADER': 'X-Profile',
+    'SECRET': None,
+    'SAMPLE_RATE': 0,
+    'PATHS': [],
+    'INTERVAL': 0.005,
+    'OUTPUT_DIR': BASE_DIR / 'profiles',
 }
 
 MIDDLEWARE = [
+    'common.instrumentation.InstrumentationMiddleware',
+    'common.profiling.SamplingProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
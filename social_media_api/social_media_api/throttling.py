@@ -0,0 +1,110 @@
+"""
+Token-bucket throttling per user and per endpoint scope.
+
+Views opt in with a ``throttle_scope`` whose rate (``"<burst>/<period>"``) is
+listed in ``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']``. Each ``(scope, user)``
+bucket holds up to ``burst`` tokens and refills continuously over ``period``,
+so it is stored as a single ``(tokens, timestamp)`` pair instead of a request
+history. Throttles run before the handler, so a rejected request does no
+database work beyond authentication, which is itself cached.
+
+Buckets live in the store named by ``THROTTLE_BUCKETS['BACKEND']``: in-process
+by default, or a Django cache shared between workers.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+BUCKET_SETTINGS = getattr(settings, 'THROTTLE_BUCKETS', {})
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """``"30/min"`` -> ``(30, 60)``."""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+def refill(bucket, capacity, rate, now):
+    """Take a token from ``bucket``; return the new bucket and the seconds to wait, 0 if allowed."""
+    tokens, stamp = bucket if bucket is not None else (capacity, now)
+    tokens = min(capacity, tokens + max(now - stamp, 0) * rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / rate
+
+
+class LocalBucketStore:
+    """In-process buckets, evicting the least recently used beyond ``MAXSIZE``."""
+
+    def __init__(self):
+        self.maxsize = BUCKET_SETTINGS.get('MAXSIZE', 100000)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        with self._lock:
+            bucket, wait = refill(self._buckets.get(key), capacity, rate, now)
+            self._buckets[key] = bucket
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.maxsize:
+                # An evicted bucket comes back full, which only errs towards allowing.
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Buckets in the Django cache named by ``THROTTLE_BUCKETS['CACHE']``, shared by
+    every process using that cache. Reads and writes are not atomic, so a burst
+    of concurrent requests from one user can overshoot by a few tokens.
+    """
+    key_prefix = 'throttle:'
+
+    def __init__(self):
+        self.cache = caches[BUCKET_SETTINGS.get('CACHE', 'default')]
+
+    def take(self, key, capacity, rate, now):
+        key = self.key_prefix + key
+        bucket, wait = refill(self.cache.get(key), capacity, rate, now)
+        # Once the bucket would be full again, a missing key means the same thing.
+        self.cache.set(key, bucket, int(capacity / rate) + 1)
+        return wait
+
+    def clear(self):
+        pass
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = import_string(BUCKET_SETTINGS.get('BACKEND', 'social_media_api.throttling.LocalBucketStore'))()
+    return _store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        if rate is None:
+            return True
+        capacity, period = parse_rate(rate)
+        ident = request.user.pk if request.user.is_authenticated else self.get_ident(request)
+        self.wait_time = get_store().take(f'{scope}:{ident}', capacity, capacity / period, time.time())
+        return not self.wait_time
+
+    def wait(self):
+        return self.wait_time